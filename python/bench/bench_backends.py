@@ -0,0 +1,78 @@
+"""
+Per-turn latency of the same session on different generation backends.
+
+By default compares the deterministic stub (in process) with Ollama's HTTP
+path against a FakeOllama that generates instantly, which isolates the
+transport and JSON overhead per turn. Real backends can be added:
+
+    python -m python.bench.bench_backends --turns 50
+    python -m python.bench.bench_backends --ollama-url http://localhost:11434 --model llama3.2:latest
+    python -m python.bench.bench_backends --transformers-model path/to/model --threads 8 --int8
+"""
+import argparse
+import json
+import statistics
+import time
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GenerationBackends.ollama_backend import OllamaBackend
+from python.main.GenerationBackends.stub_backend import StubBackend
+from python.main.OllamaServerServices.fake_ollama import FakeOllama
+from python.main.OllamaServerServices.ollama_client import OllamaClient
+
+
+def play(name, backend, model, turns, num_predict):
+    game = AIAdventureGame(model, backend=backend)
+    game.options["num_predict"] = num_predict
+    game.prepare_game()
+    latencies, tokens = [], 0
+    for turn in range(turns):
+        started = time.perf_counter()
+        reply = game._generate_response(f"I search the room ({turn})", on_token=lambda token: None)
+        latencies.append(time.perf_counter() - started)
+        if reply.startswith("Error:"):
+            raise RuntimeError(f"{name}: {reply}")
+        tokens += game.last_turn_stats["eval_count"]
+    return {
+        "backend": name,
+        "turns": turns,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(statistics.quantiles(latencies, n=20)[18] * 1000, 3),
+        "tokens_per_s": round(tokens / sum(latencies), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--num-predict", type=int, default=40)
+    parser.add_argument("--ollama-url", help="Also run against this Ollama server")
+    parser.add_argument("--model", default="llama3.2:latest", help="Model for --ollama-url")
+    parser.add_argument("--transformers-model", help="Also run a model loaded in process from this path")
+    parser.add_argument("--threads", type=int, help="CPU threads for the in-process model")
+    parser.add_argument("--int8", action="store_true", help="Quantise the in-process model to int8")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = [play("stub", StubBackend(reply_tokens=args.num_predict), "stub", args.turns, args.num_predict)]
+    with FakeOllama(decode_tps=1e9, prefill_tps=1e12, reply_tokens=args.num_predict) as fake:
+        backend = OllamaBackend(OllamaClient(fake.base_url))
+        results.append(play("ollama-http (fake)", backend, fake.model, args.turns, args.num_predict))
+    if args.ollama_url:
+        backend = OllamaBackend(OllamaClient(args.ollama_url))
+        results.append(play("ollama-http", backend, args.model, args.turns, args.num_predict))
+    if args.transformers_model:
+        from python.main.GenerationBackends.transformers_backend import TransformersBackend
+        backend = TransformersBackend(args.transformers_model, num_threads=args.threads, quantize=args.int8)
+        results.append(play("transformers" + (" int8" if args.int8 else ""), backend, "local",
+                            args.turns, args.num_predict))
+
+    for result in results:
+        print(f"{result['backend']:>20}: p50 {result['p50_ms']:9.3f} ms  p95 {result['p95_ms']:9.3f} ms  "
+              f"{result['tokens_per_s']:10.1f} tokens/s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Turn latency of the multi-session game server with 1, 8 and 32 simulated players.
+
+Runs against local FakeOllama servers, so the numbers measure scheduling
+and queueing overhead under a fixed backend cost model, not a real model.
+With --backends N the sessions are spread over N fakes through a BackendPool.
+
+    python -m python.bench.bench_game_server --players 1 8 32 --turns 5
+    python -m python.bench.bench_game_server --players 32 --backends 4
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from python.main.GameFolder.game_server import GameServer, read_events
+from python.main.OllamaServerServices.fake_ollama import FakeOllama
+from python.main.OllamaServerServices.backend_pool import BackendPool
+
+
+async def post_turn(host, port, path, body):
+    """Send one request to the game server and consume its event stream. Returns the final event."""
+    reader, writer = await asyncio.open_connection(host, port)
+    payload = json.dumps(body).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+    await writer.drain()
+    status = await reader.readline()
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    result = {"status": int(status.split()[1])}
+    session_id = None
+    async for event, data in read_events(reader):
+        if event == "session":
+            session_id = data["session_id"]
+        elif event in ("done", "error"):
+            result = dict(data, event=event)
+    writer.close()
+    return session_id, result
+
+
+async def player(host, port, turns, latencies):
+    """Play one session: the opening scene and then a fixed number of turns."""
+    started = time.perf_counter()
+    session_id, _ = await post_turn(host, port, "/sessions", {})
+    latencies.append(time.perf_counter() - started)
+    for turn in range(turns):
+        started = time.perf_counter()
+        await post_turn(host, port, f"/sessions/{session_id}/turns", {"input": f"I look around ({turn})"})
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(players, turns, max_in_flight, fakes):
+    backends = None
+    if len(fakes) > 1:
+        backends = BackendPool()
+        for fake in fakes:
+            backends.register(fake.base_url)
+    server = GameServer(fakes[0].model, base_url=fakes[0].base_url, port=0,
+                        max_in_flight=max_in_flight * len(fakes), max_queued=max(64, players),
+                        backends=backends)
+    host, port = await server.start()
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(player(host, port, turns, latencies) for _ in range(players)))
+    elapsed = time.perf_counter() - started
+    await server.stop()
+    quantiles = statistics.quantiles(latencies, n=20, method="inclusive")
+    return {
+        "players": players,
+        "turns": len(latencies),
+        "p50_s": round(statistics.median(latencies), 4),
+        "p95_s": round(quantiles[18], 4),
+        "turns_per_s": round(len(latencies) / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--turns", type=int, default=5, help="Turns per player after the opening scene")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Per backend; also the fakes' num_parallel")
+    parser.add_argument("--backends", type=int, default=1, help="Number of fake Ollama servers to pool")
+    parser.add_argument("--decode-tps", type=float, default=200.0)
+    parser.add_argument("--reply-tokens", type=int, default=20)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    fakes = [FakeOllama(decode_tps=args.decode_tps, reply_tokens=args.reply_tokens,
+                        num_parallel=args.max_in_flight) for _ in range(args.backends)]
+    for fake in fakes:
+        fake.start()
+    try:
+        for players in args.players:
+            result = asyncio.run(run(players, args.turns, args.max_in_flight, fakes))
+            result["backends"] = args.backends
+            print(f"{result['players']:>3} players: p50 {result['p50_s'] * 1000:8.1f} ms  "
+                  f"p95 {result['p95_s'] * 1000:8.1f} ms  {result['turns_per_s']:6.1f} turns/s")
+            results.append(result)
+    finally:
+        for fake in fakes:
+            fake.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
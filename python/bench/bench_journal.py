@@ -0,0 +1,124 @@
+"""
+Save cost, resume time and file size of the turn journal on long sessions.
+
+Saves a session of N turns through AIAdventureGame's journal (one record per
+turn plus a snapshot every snapshot_every turns), then resumes it from the
+snapshot and by replaying the whole journal. As a reference, it also times
+rewriting the whole history as one JSON file after every turn.
+No server is needed.
+
+    python -m python.bench.bench_journal --turns 1000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GameFolder.journal import TurnJournal
+from python.main.GenerationBackends.stub_backend import StubBackend
+
+WORDS = ("the ancient door creaks open and a cold wind carries the smell of rain through the hall where "
+         "torches flicker against walls of dark stone you hear footsteps somewhere above and a voice "
+         "calls your name the guard reaches for his sword while the merchant hides behind the cart").split()
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _ms(values):
+    values = sorted(values)
+    return {
+        "p50_ms": round(statistics.median(values) * 1000, 4),
+        "p99_ms": round(values[min(len(values) - 1, int(0.99 * len(values)))] * 1000, 4),
+        "total_ms": round(sum(values) * 1000, 2),
+    }
+
+
+def make_game():
+    """Game that never talks to a server; older turns are folded into a fixed-size stand-in summary."""
+    game = AIAdventureGame("bench", backend=StubBackend())
+    game.context_window.summarize = lambda summary, messages: text(random.Random(len(messages)), 150)
+    return game
+
+
+def run(turns, reply_words, context_tokens, directory):
+    rng = random.Random(0)
+    path = os.path.join(directory, "session.journal")
+    game = make_game()
+    game.journal = TurnJournal(path)
+    game.prepare_game()
+    game.context = list(range(context_tokens))  # Stands in for Ollama's context array
+
+    appends, snapshots, rewrites = [], [], []
+    history_path = os.path.join(directory, "history.json")
+    for turn in range(turns):
+        user, reply = text(rng, 12), text(rng, reply_words)
+        game.conversation_history += [{"role": "user", "content": user}, {"role": "assistant", "content": reply}]
+        game.context_window.add("user", user)
+        game.context_window.add("assistant", reply)
+        # As after every turn of a real game, keeping the window (and so the snapshot) bounded
+        game.context_window.maybe_compact()
+        game.context_window.wait()
+        snapshot_due = game._turns_since_snapshot + 1 >= game.snapshot_every
+        started = time.perf_counter()
+        game._save_turn(user, reply)
+        (snapshots if snapshot_due else appends).append(time.perf_counter() - started)
+
+        # Reference: save by rewriting the whole transcript
+        started = time.perf_counter()
+        with open(history_path, "w") as f:
+            json.dump(game.conversation_history, f)
+        rewrites.append(time.perf_counter() - started)
+    game.journal.close()
+
+    def resume(from_snapshot):
+        if not from_snapshot:
+            os.rename(path + ".snapshot", path + ".snapshot.off")
+        started = time.perf_counter()
+        resumed = make_game()
+        with TurnJournal(path) as journal:
+            resumed.resume(journal)
+        elapsed = time.perf_counter() - started
+        if not from_snapshot:
+            os.rename(path + ".snapshot.off", path + ".snapshot")
+        return elapsed, resumed.context is not None
+
+    snapshot_resume, context_reused = resume(True)
+    replay_resume, _ = resume(False)
+    return {
+        "turns": turns,
+        "append": _ms(appends),
+        "append_with_snapshot": _ms(snapshots),
+        "rewrite_whole_history": _ms(rewrites),
+        "last_rewrite_ms": round(rewrites[-1] * 1000, 4),
+        "resume_from_snapshot_ms": round(snapshot_resume * 1000, 3),
+        "resume_full_replay_ms": round(replay_resume * 1000, 3),
+        "context_reused": context_reused,
+        "journal_bytes": os.path.getsize(path),
+        "snapshot_bytes": os.path.getsize(path + ".snapshot"),
+        "raw_json_bytes": os.path.getsize(history_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--reply-words", type=int, default=120)
+    parser.add_argument("--context-tokens", type=int, default=4096, help="Length of the saved context array")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        result = run(args.turns, args.reply_words, args.context_tokens, directory)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Turn latency with DEBUG logging enabled vs logging disabled.
+
+Plays a number of turns against a local FakeOllama with the logging pipeline
+configured at DEBUG, at INFO, and with logging disabled, and reports the
+per-turn latency for each.
+
+    python -m python.bench.bench_logging --turns 200
+"""
+import argparse
+import json
+import logging
+import statistics
+import tempfile
+import time
+from python.main.utils.logging_config import init_logging, shutdown_logging
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.OllamaServerServices.fake_ollama import FakeOllama
+from python.main.OllamaServerServices.ollama_client import OllamaClient
+
+MODES = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "off": None,
+}
+
+
+def play(fake, turns):
+    """Play the opening scene and `turns` turns without printing. Returns per-turn latencies."""
+    game = AIAdventureGame(fake.model, client=OllamaClient(fake.base_url))
+    game.prepare_game()
+    latencies = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        game._generate_response(f"I search the room ({turn})", on_token=lambda token: None)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    # A fast backend, so the logging overhead is not lost in generation time
+    with FakeOllama(decode_tps=20000, prefill_tps=1e6, reply_tokens=args.reply_tokens) as fake, \
+            tempfile.TemporaryDirectory() as directory:
+        play(fake, 10)  # Warm up connections and caches
+        for mode, level in MODES.items():
+            if level is None:
+                logging.disable(logging.CRITICAL)
+            else:
+                init_logging(directory, level=level, levels={"urllib3": level})
+            latencies = play(fake, args.turns)
+            shutdown_logging()
+            logging.disable(logging.NOTSET)
+            result = {
+                "mode": mode,
+                "turns": len(latencies),
+                "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+                "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                "p95_ms": round(statistics.quantiles(latencies, n=20)[18] * 1000, 3),
+            }
+            print(f"{mode:>5}: mean {result['mean_ms']:7.3f} ms  p50 {result['p50_ms']:7.3f} ms  "
+                  f"p95 {result['p95_ms']:7.3f} ms")
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
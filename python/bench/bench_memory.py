@@ -0,0 +1,98 @@
+"""
+Retrieval latency of TurnMemory and prompt size with memory vs the full history.
+
+The first part fills a memory with random unit vectors and times top-k
+searches at increasing session lengths and embedding sizes. The second
+plays turns against a local FakeOllama and reports the prompt tokens per
+turn when resending the history vs recalling from memory.
+
+    python -m python.bench.bench_memory --turns 1000 10000 --dims 384 768
+"""
+import argparse
+import json
+import statistics
+import time
+import numpy as np
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GameFolder.memory import TurnMemory
+from python.main.OllamaServerServices.fake_ollama import FakeOllama
+from python.main.OllamaServerServices.ollama_client import OllamaClient
+
+
+def bench_search(turns, dim, queries=200):
+    rng = np.random.default_rng(0)
+    memory = TurnMemory(client=None)
+    vectors = rng.standard_normal((turns, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    started = time.perf_counter()
+    for i, vector in enumerate(vectors):
+        memory.append(vector, f"turn {i}")
+    fill = time.perf_counter() - started
+    probes = vectors[rng.integers(0, turns, queries)]
+    for probe in probes[:10]:
+        memory.search(probe)
+    latencies = []
+    for probe in probes:
+        started = time.perf_counter()
+        memory.search(probe)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "turns": turns,
+        "dim": dim,
+        "capacity": len(memory.vectors),
+        "append_us": round(fill / turns * 1e6, 3),
+        "search_p50_ms": round(statistics.median(latencies) * 1000, 4),
+        "search_p95_ms": round(statistics.quantiles(latencies, n=20)[18] * 1000, 4),
+    }
+
+
+def bench_prompt(turns):
+    """Prompt tokens per turn with a full (bounded) history and with memory recall."""
+    results = []
+    with FakeOllama(decode_tps=20000, prefill_tps=1e6, reply_tokens=60) as fake:
+        client = OllamaClient(fake.base_url)
+        for mode in ("history", "memory"):
+            game = AIAdventureGame(fake.model, incremental=False, num_ctx=1 << 20, client=client)
+            if mode == "memory":
+                game.memory = TurnMemory(client)
+            game.prepare_game()
+            tokens = []
+            for turn in range(turns):
+                game._generate_response(f"I search the room ({turn})", on_token=lambda token: None)
+                tokens.append(game.last_turn_stats["prompt_tokens"])
+                if game.memory is not None:
+                    game.memory.wait()
+            results.append({"mode": mode, "turns": turns, "first": tokens[0], "last": tokens[-1],
+                            "max": max(tokens)})
+            if game.memory is not None:
+                game.memory.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--dims", type=int, nargs="+", default=[384, 768])
+    parser.add_argument("--prompt-turns", type=int, default=100, help="Turns played for the prompt size comparison")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"search": [], "prompt": []}
+    for dim in args.dims:
+        for turns in args.turns:
+            result = bench_search(turns, dim)
+            print(f"{turns:>6} turns x {dim} dims: search p50 {result['search_p50_ms']:.3f} ms  "
+                  f"p95 {result['search_p95_ms']:.3f} ms  (append {result['append_us']:.1f} us)")
+            results["search"].append(result)
+    for result in bench_prompt(args.prompt_turns):
+        print(f"{result['mode']:>7}: prompt tokens on turn 1 {result['first']}, "
+              f"on turn {result['turns']} {result['last']}")
+        results["prompt"].append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
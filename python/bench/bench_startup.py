@@ -0,0 +1,126 @@
+"""
+Cold start of the CLI: time from launching `python -m python.main play` to the first prompt.
+
+Each run spawns a fresh interpreter with `-X importtime` against a local
+FakeOllama (attached to, not spawned), waits for "What do you do?" on its
+output and quits. Reports the launch-to-prompt time, the time spent
+importing modules and the slowest top-level imports, plus how long
+`python -m python.main --help` takes, which imports no command at all, and
+`play --help`, which imports the game but none of its HTTP stack.
+
+    python -m python.bench.bench_startup --runs 5
+    python -m python.bench.run_benchmarks --only cli
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from python.main.OllamaServerServices.fake_ollama import FakeOllama
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+PROMPT = b"What do you do? >"
+
+
+def parse_importtime(stderr):
+    """(total seconds spent importing, {top-level module: cumulative seconds}) from -X importtime output."""
+    total, top = 0, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        total += int(self_us)
+        if not name[1:].startswith(" "):  # Nested imports are indented
+            top[name.strip()] = int(cumulative_us) / 1e6
+    return total / 1e6, top
+
+
+def launch(port, timeout=60):
+    """Run `play` once. Returns (seconds to the first prompt, stderr)."""
+    env = dict(os.environ, PYTHONUNBUFFERED="1", AI_ADVENTURE_METRICS_PORT="0")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-X", "importtime", "-m", "python.main", "play", "--port", str(port)],
+                               cwd=REPO_ROOT, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    stderr = []
+    # Drained on the side so a chatty stderr cannot block the game
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read().decode(errors="replace")))
+    reader.start()
+    killer = threading.Timer(timeout, process.kill)
+    killer.start()
+    output = b""
+    try:
+        while PROMPT not in output:
+            chunk = os.read(process.stdout.fileno(), 4096)
+            if not chunk:
+                raise RuntimeError(f"play exited before its first prompt: {output.decode(errors='replace')[-500:]}")
+            output += chunk
+        elapsed = time.perf_counter() - started
+        process.stdin.write(b"quit\n")
+        process.stdin.flush()
+        process.wait()
+    finally:
+        killer.cancel()
+        if process.poll() is None:
+            process.kill()
+        reader.join()
+    return elapsed, stderr[0] if stderr else ""
+
+
+def time_command(args, runs):
+    """Median seconds `python -m python.main <args>` takes."""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "python.main"] + args, cwd=REPO_ROOT, capture_output=True, check=True)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def cli_startup(runs=5, port=11498):
+    """Launch-to-first-prompt and import time of `play`, and the time of `--help` and `play --help`."""
+    to_prompt, imports = [], []
+    top = {}
+    with FakeOllama(port=port, decode_tps=1e6, prefill_tps=1e9, reply_tokens=20):
+        for _ in range(runs):
+            elapsed, stderr = launch(port)
+            total, top = parse_importtime(stderr)
+            to_prompt.append(elapsed)
+            imports.append(total)
+    slowest = sorted(top.items(), key=lambda item: item[1], reverse=True)[:8]
+    return {
+        "runs": runs,
+        "to_first_prompt_p50_s": round(statistics.median(to_prompt), 4),
+        "to_first_prompt_max_s": round(max(to_prompt), 4),
+        "imports_p50_s": round(statistics.median(imports), 4),
+        "help_p50_s": round(time_command(["--help"], runs), 4),
+        "play_help_p50_s": round(time_command(["play", "--help"], runs), 4),
+        "slowest_imports_s": {name: round(seconds, 4) for name, seconds in slowest},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=11498, help="Port of the fake Ollama server")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    result = cli_startup(args.runs, args.port)
+    print(f"launch to first prompt: p50 {result['to_first_prompt_p50_s'] * 1000:.0f} ms, "
+          f"max {result['to_first_prompt_max_s'] * 1000:.0f} ms")
+    print(f"of which imports:       p50 {result['imports_p50_s'] * 1000:.0f} ms")
+    print(f"--help:                 p50 {result['help_p50_s'] * 1000:.0f} ms")
+    print(f"play --help:            p50 {result['play_help_p50_s'] * 1000:.0f} ms")
+    for name, seconds in result["slowest_imports_s"].items():
+        print(f"  {seconds * 1000:7.1f} ms  {name}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
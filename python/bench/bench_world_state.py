@@ -0,0 +1,89 @@
+"""
+Prompt tokens of a scripted session with the full history join vs the world-state prompt.
+
+Plays the same scripted inputs against a local FakeOllama twice: once with
+the whole conversation joined into every prompt (incremental=False, no
+budget), once with a WorldStateTracker and only the latest messages. The
+extraction calls run off the critical path but are not free, so their
+prompt tokens are reported too.
+
+    python -m python.bench.bench_world_state --turns 100
+"""
+import argparse
+import itertools
+import json
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GameFolder.world_state import WorldStateTracker
+from python.main.OllamaServerServices.fake_ollama import FakeOllama
+from python.main.OllamaServerServices.ollama_client import OllamaClient
+
+SCRIPT = [
+    "I look around the tavern",
+    "I ask the barkeep about the missing caravan",
+    "I buy a lantern and a coil of rope",
+    "I head north along the forest road",
+    "I search the overturned wagon",
+    "I pick up the broken seal",
+    "I follow the tracks into the woods",
+    "I climb the old watchtower",
+    "I light the lantern and go down the stairs",
+    "I talk to the hooded stranger",
+    "I show the stranger the broken seal",
+    "I draw my sword and fight the wolves",
+    "I bandage my wounds",
+    "I open the iron gate with the rusty key",
+    "I return to the tavern and rest",
+]
+
+
+def play(fake, turns, world):
+    client = OllamaClient(fake.base_url)
+    game = AIAdventureGame(fake.model, incremental=False, num_ctx=1 << 22, client=client)
+    tracker = None
+    if world:
+        tracker = game.world = WorldStateTracker(client, fake.model)
+    game.prepare_game()
+    prompt_tokens, extraction_tokens = [], 0
+    for user_input in itertools.islice(itertools.cycle(SCRIPT), turns):
+        game._generate_response(user_input, on_token=lambda token: None)
+        prompt_tokens.append(game.last_turn_stats["prompt_tokens"])
+        if tracker is not None:
+            tracker.wait()
+            extraction_tokens += tracker.last_prompt_tokens
+    if tracker is not None:
+        tracker.close()
+    client.close()
+    return {
+        "mode": "world_state" if world else "full_history",
+        "turns": turns,
+        "prompt_tokens_total": sum(prompt_tokens),
+        "prompt_tokens_last_turn": prompt_tokens[-1],
+        "extraction_prompt_tokens_total": extraction_tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--reply-tokens", type=int, default=120)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    with FakeOllama(decode_tps=50000, prefill_tps=1e7, reply_tokens=args.reply_tokens) as fake:
+        full = play(fake, args.turns, world=False)
+        world = play(fake, args.turns, world=True)
+    for result in (full, world):
+        print(f"{result['mode']:>12}: {result['prompt_tokens_total']:>8} prompt tokens over {result['turns']} turns, "
+              f"{result['prompt_tokens_last_turn']} on the last turn, "
+              f"{result['extraction_prompt_tokens_total']} for extraction")
+    saved = full["prompt_tokens_total"] - world["prompt_tokens_total"]
+    net = saved - world["extraction_prompt_tokens_total"]
+    print(f"Saved {saved} prompt tokens on the critical path ({saved / full['prompt_tokens_total']:.0%}), "
+          f"{net} ({net / full['prompt_tokens_total']:.0%}) including extraction")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": [full, world], "saved": saved, "saved_net": net}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
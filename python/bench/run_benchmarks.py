@@ -0,0 +1,252 @@
+"""
+End-to-end benchmark suite against the fake Ollama server.
+
+Measures startup time (of the server, and of the CLI up to its first
+prompt), turn latency against history length, throughput against
+concurrent sessions, recovery time after a crash and how promptly turns
+are cancelled or held to a deadline, and writes the results with the
+commit they were measured on as JSON, so runs can be compared across
+commits:
+
+    python -m python.bench.run_benchmarks                     # writes bench_results/<commit>.json
+    python -m python.bench.run_benchmarks --only latency startup
+    python -m python.bench.run_benchmarks --compare bench_results/old.json bench_results/new.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from python.bench import bench_game_server
+from python.bench.bench_startup import cli_startup
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.OllamaServerServices.fake_ollama import FakeOllama, write_executable
+from python.main.OllamaServerServices.ollama_client import OllamaClient
+from python.main.OllamaServerServices.ollama_service import OllamaService
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench_results")
+
+
+def _summary(values):
+    values = sorted(values)
+    return {
+        "runs": len(values),
+        "p50_s": round(statistics.median(values), 4),
+        "p95_s": round(values[min(len(values) - 1, int(0.95 * len(values)))], 4),
+        "max_s": round(values[-1], 4),
+    }
+
+
+def bench_startup(runs, port):
+    """Seconds from spawning `ollama serve` (the fake executable) to ready, and to attach to a running one."""
+    spawn, attach = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        executable = write_executable(directory)
+        for _ in range(runs):
+            server = OllamaService(executable, port=port)
+            started = time.perf_counter()
+            server.start()
+            spawn.append(time.perf_counter() - started)
+            other = OllamaService(executable, port=port)
+            started = time.perf_counter()
+            other.start()
+            attach.append(time.perf_counter() - started)
+            server.stop()
+    return {"spawn": _summary(spawn), "attach": _summary(attach)}
+
+
+def bench_latency(history_lengths, prefill_tps, reply_tokens):
+    """
+    Turn latency once the conversation already holds N turns, with and without context reuse.
+
+    The fake charges prefill per prompt token, so resending the history grows
+    with N while incremental mode only pays for the new input.
+    """
+    results = []
+    with FakeOllama(decode_tps=2000, prefill_tps=prefill_tps, reply_tokens=reply_tokens) as fake:
+        for incremental in (False, True):
+            game = AIAdventureGame(fake.model, incremental=incremental, num_ctx=1 << 20,
+                                   client=OllamaClient(fake.base_url))
+            game.prepare_game()
+            played = 0
+            for length in history_lengths:
+                while played < length:
+                    game._generate_response(f"I walk on ({played})", on_token=lambda token: None)
+                    played += 1
+                samples = []
+                for sample in range(3):
+                    started = time.perf_counter()
+                    game._generate_response(f"I look around ({sample})", on_token=lambda token: None)
+                    samples.append(time.perf_counter() - started)
+                    played += 1
+                results.append({
+                    "incremental": incremental,
+                    "history_turns": length,
+                    "p50_s": round(statistics.median(samples), 4),
+                    "prompt_eval_count": game.last_turn_stats.get("prompt_eval_count"),
+                })
+            game.client.close()
+    return results
+
+
+def bench_throughput(player_counts, turns):
+    """Turns per second through the game server as the number of concurrent sessions grows."""
+    results = []
+    with FakeOllama(decode_tps=200, reply_tokens=20, num_parallel=4) as fake:
+        for players in player_counts:
+            results.append(asyncio.run(bench_game_server.run(players, turns, 4, [fake])))
+    return results
+
+
+def bench_recovery(crashes, port):
+    """Seconds from killing the server process until the supervisor has it serving again."""
+    detected, serving = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        server = OllamaService(write_executable(directory), port=port)
+        server.start()
+        server.supervise(interval=0.1, failures_before_restart=1)
+        try:
+            for _ in range(crashes):
+                before = len(server.recovery_times)
+                crashed = time.perf_counter()
+                server.process.kill()
+                while len(server.recovery_times) == before:
+                    time.sleep(0.01)
+                serving.append(time.perf_counter() - crashed)
+                detected.append(server.recovery_times[-1])
+        finally:
+            server.stop()
+    return {"from_crash": _summary(serving), "from_detection": _summary(detected)}
+
+
+def bench_deadlines(runs, deadline=1.0):
+    """
+    Turns with a deadline far shorter than a full reply, and turns cancelled mid-reply.
+
+    Reports turn times against the deadline (num_predict adapts once the
+    decode rate is known), how long a cancelled turn takes to return and
+    whether the server stopped generating.
+    """
+    with FakeOllama(decode_tps=50, prefill_tps=20000, reply_tokens=200) as fake:
+        game = AIAdventureGame(fake.model, client=OllamaClient(fake.base_url))
+        game.prepare_game()
+        game.turn_deadline = deadline
+        walls, cutoffs = [], 0
+        for turn in range(runs):
+            game._generate_response(f"I run ({turn})", on_token=lambda token: None)
+            walls.append(game.last_turn_stats["wall_time"])
+            cutoffs += game.last_turn_stats["done_reason"] == "deadline"
+        num_predict = game.last_turn_stats["num_predict"]
+        game.turn_deadline = None
+        cancelled_at, returned = [], []
+        for turn in range(runs):
+            def cancel():
+                cancelled_at.append(time.perf_counter())
+                game.cancel_turn()
+            threading.Timer(0.3, cancel).start()
+            game._generate_response(f"I hide ({turn})", on_token=lambda token: None)
+            returned.append(time.perf_counter() - cancelled_at[-1])
+        time.sleep(0.1)  # Let the server notice the last closed stream
+        game.client.close()
+        return {
+            "deadline_s": deadline,
+            "turn": _summary(walls),
+            "cutoffs": cutoffs,
+            "num_predict": num_predict,
+            "cancel_to_return": _summary(returned),
+            "server_aborted": fake.aborted,
+            "wasted_s": round(game.wasted_seconds, 3),
+        }
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def flatten(results, prefix=""):
+    """Map "section.key..." paths to the numeric leaves of a result tree; list entries are keyed by index."""
+    flat = {}
+    items = enumerate(results) if isinstance(results, list) else results.items()
+    for key, value in items:
+        path = f"{prefix}{key}"
+        if isinstance(value, (dict, list)):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(old_path, new_path):
+    """Print every metric that differs between two result files, with the relative change."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        if before == after:
+            continue
+        change = f"{(after - before) / before * 100:+7.1f}%" if before else "    new"
+        print(f"  {key:<45} {before:>10} -> {after:<10} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=["startup", "cli", "latency", "throughput", "recovery", "deadlines"])
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 10, 25, 50])
+    parser.add_argument("--prefill-tps", type=float, default=5000.0)
+    parser.add_argument("--players", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--runs", type=int, default=5, help="Startups and crashes to measure")
+    parser.add_argument("--port", type=int, default=11499, help="Port for the spawned fake executable")
+    parser.add_argument("--output", help="Result file, defaults to bench_results/<commit>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    benchmarks = {
+        "startup": lambda: bench_startup(args.runs, args.port),
+        "cli": lambda: cli_startup(args.runs, args.port - 1),
+        "latency": lambda: bench_latency(args.history, args.prefill_tps, reply_tokens=40),
+        "throughput": lambda: bench_throughput(args.players, turns=5),
+        "recovery": lambda: bench_recovery(args.runs, args.port),
+        "deadlines": lambda: bench_deadlines(args.runs),
+    }
+    results = {}
+    for name in args.only or benchmarks:
+        started = time.perf_counter()
+        results[name] = benchmarks[name]()
+        print(f"{name}: {json.dumps(results[name])} ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+
+    report = {"meta": metadata(), "results": results}
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
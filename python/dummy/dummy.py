@@ -1,5 +1,6 @@
 import requests
-import json
+
+from python.main.OllamaServerServices.ollama_client import get_client
 
 
 # Define the system prompt for AI Dungeon
@@ -28,36 +29,24 @@ SYSTEM_PROMPT = (
 
 def query_ollama(prompt):
     # Query the Ollama model with the prompt
-    url = "http://localhost:11434/api/generate"  # Adjust if needed for your local setup
+    client = get_client()  # Adjust the base URL if needed for your local setup
     payload = {
         "model": "llama3.2:latest",
         "prompt": prompt,
-        "max_tokens": 150,  # Limit token usage for faster responses
+        "options": {"num_predict": 150},  # Limit the reply length for faster responses (Ollama ignores "max_tokens")
         "stream": True,  # Enable streaming
         "raw": True
     }
-    headers = {"Content-Type": "application/json"}
-
-    # Initialize the response generator
-    response = requests.post(url, json=payload, headers=headers, stream=True)
-
-    # Check if the response is successful
-    if response.status_code == 200:
+    # Stream through the response; the client reassembles NDJSON records
+    # that span chunk boundaries before decoding them
+    try:
         generated_text = ""
-        # Stream through the response
-        for chunk in response.iter_content(chunk_size=1024):
-            # Decode the bytes response content to a string
-            response_text = chunk.decode("utf-8")
-            # Parse the JSON data (it might be in chunks)
-            try:
-                json_data = json.loads(response_text)
-                # Extract the response text from the "response" field
-                generated_text += json_data.get("response", "")
-            except json.JSONDecodeError:
-                print("Failed to parse JSON chunk.")
+        for json_data in client.stream("/api/generate", payload):
+            # Extract the response text from the "response" field
+            generated_text += json_data.get("response", "")
         return generated_text
-    else:
-        print("Error querying model:", response.text)
+    except (requests.exceptions.RequestException, RuntimeError) as e:
+        print("Error querying model:", e)
         return "Oops! Something went wrong."
 
 
@@ -81,5 +70,6 @@ def ai_dungeon():
         context += f"\nPlayer: {user_input}\nGame Master: {response}"
 
 
-# Start the game
-ai_dungeon()
+if __name__ == "__main__":
+    # Start the game
+    ai_dungeon()
@@ -1,15 +1,68 @@
+import argparse
+import os
 import sys
-import requests
+import atexit
+import threading
 import time
-from python.main.utils.logging_config import logging  # Import the logging configuration
+from python.main.utils.logging_config import logging, log_dir, init_logging  # Import the logging configuration
 from python.main.OllamaServerServices import ollama_service  # Adjust this import based on your project structure
+from python.main.OllamaServerServices.model_manager import ModelManager
+from python.main.OllamaServerServices.ollama_client import get_client
+from python.main.GenerationBackends.ollama_backend import OllamaBackend
+from python.main.GameFolder.context_window import ContextWindowManager
+from python.main.GameFolder.response_cache import ResponseCache, is_deterministic
+from python.main.GameFolder.journal import TurnJournal
+from python.main.GameFolder.world_state import WorldState, WorldStateTracker
+from python.main.utils import metrics
+from python.main.utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+
+class TurnCancelled(Exception):
+    """Raised when a turn is aborted before its reply is complete; the turn is left out of the session."""
+
 
 class AIAdventureGame:
-    def __init__(self, model_name):
+    def __init__(self, model_name, stream=True, incremental=True, keep_alive="30m", num_ctx=4096, client=None,
+                 backend=None):
         self.model_name = model_name
+        self.client = client or get_client()  # Pooled keep-alive HTTP client for the Ollama API
+        self.backend = backend or OllamaBackend(self.client)  # What generates the text, Ollama over HTTP by default
+        self.stream = stream  # Print tokens as they arrive instead of waiting for the full reply
+        self.incremental = incremental  # Send only the new input and reuse the server's KV cache
+        self.keep_alive = keep_alive  # How long Ollama keeps the model loaded between turns
+        self.context = None  # Token array returned by /api/generate for the conversation so far
+        self.options = {"num_ctx": num_ctx}  # Ollama generation options sent with every request
+        # Bounds the prompt: pins the system prompt, keeps recent turns, summarises the rest
+        self.context_window = ContextWindowManager(self._summarize, num_ctx=num_ctx)
         self.conversation_history = []
-        self.base_url = "http://localhost:11434/api/generate"
         self.logger = logging.getLogger('game')  # Use the game logger
+        self.last_turn_stats = {}  # Timing and token counts of the most recent turn
+        self.metrics = metrics.REGISTRY  # Where per-turn stats are recorded
+        self.launched_at = None  # perf_counter() at program start, used to report cold-start time
+        self.models = None  # Optional ModelManager that tracks which models are resident
+        self.model_ready = None  # Optional Future from ModelManager.preload_async, awaited before the first request
+        self.backends = None  # Optional BackendPool; when set, each turn is routed through it
+        self.session_id = None  # Key the BackendPool pins this session's backend by
+        self.breaker = None  # Optional CircuitBreaker of the supervised server
+        self.recovery_wait = 30  # Seconds to wait for an open breaker to close before giving up on a turn
+        self.cache = None  # Optional ResponseCache, consulted for deterministic requests
+        self.cache_openings = False  # Also reuse cached opening scenes when sampling is random
+        self.journal = None  # Optional TurnJournal the session is saved to, one record per turn
+        self.snapshot_every = 20  # Turns between snapshots of the context window and context tokens
+        self._turns_since_snapshot = 0
+        self.memory = None  # Optional TurnMemory; past turns are then recalled by similarity instead of resent
+        self.world = None  # Optional WorldStateTracker; its state replaces the prose history in the prompt
+        self.recent_messages = 4  # Messages kept verbatim in the prompt when memory or world state is used
+        self.turn_deadline = None  # Optional seconds a turn may take; num_predict is capped to fit in them
+        self.read_timeout = 120  # Seconds a generation may go without producing a token
+        self.min_predict = 32  # Lowest num_predict a deadline may cap a reply to
+        self.decode_tps = None  # Recent decode rate (tokens/s), what a deadline is converted to tokens with
+        self.ttft = None  # Recent time to first token in seconds
+        self.controller = None  # Optional OptionsController sizing num_predict and num_ctx to a latency target
+        self.wasted_seconds = 0.0  # Generation time spent on turns that were cancelled or timed out
+        self._turn_cancel = None  # Event of the turn being generated, set by cancel_turn()
 
         # System prompt that instructs the model to behave like AI Dungeon
         self.system_prompt = """You are an advanced text adventure game like AI Dungeon. You will act as the game master and narrator.
@@ -38,8 +91,17 @@ Current setting: [SETTING]
 
 Begin by describing the opening scene and asking the player what they want to do."""
 
+    OPENING_PROMPT = "Start the adventure."
+
     def start_game(self, genre="fantasy", theme="adventure", setting="medieval kingdom"):
         """Initialize and start the game with specific parameters"""
+        self.prepare_game(genre, theme, setting)
+
+        # Get the opening scene
+        self._respond(self.OPENING_PROMPT)
+
+    def prepare_game(self, genre="fantasy", theme="adventure", setting="medieval kingdom"):
+        """Set up the system prompt and a fresh history, without generating anything yet"""
         self.logger.debug("Starting game with genre: %s, theme: %s, setting: %s", genre, theme, setting)
         self.system_prompt = self.system_prompt.replace("[GENRE]", genre)
         self.system_prompt = self.system_prompt.replace("[THEME]", theme)
@@ -47,126 +109,690 @@ Begin by describing the opening scene and asking the player what they want to do
 
         # Initialize the conversation with the system prompt
         self.conversation_history = [{"role": "system", "content": self.system_prompt}]
-
-        # Get the opening scene
-        response = self._generate_response("Start the adventure.")
-        print("\n" + response + "\n")
-
-    def _generate_response(self, user_input):
-        """Generate a response from the AI model"""
-        max_retries = 3
-        retry_delay = 2
-
-        for attempt in range(max_retries):
-            try:
-                # Add user input to history
-                self.conversation_history.append({"role": "user", "content": user_input})
-
-                # Prepare the prompt with conversation history
-                full_prompt = "\n".join([msg["content"] for msg in self.conversation_history])
-
-                headers = {"Content-Type": "application/json"}
-                payload = {
-                    "model": self.model_name,
-                    "prompt": full_prompt,
-                    "stream": False
-                }
-
-                self.logger.debug("Attempt %d: Sending request to server...", attempt + 1)
-
-                response = requests.post(
-                    self.base_url,
-                    json=payload,
-                    headers=headers,
-                    timeout=30  # Add timeout
-                )
-
-                response.raise_for_status()
-                result = response.json()
-                generated_text = result["response"]
-
-                # Add AI response to history
-                self.conversation_history.append({"role": "assistant", "content": generated_text})
-                return generated_text
-
-            except requests.exceptions.ConnectionError:
-                self.logger.warning("Connection error on attempt %d", attempt + 1)
-                if attempt < max_retries - 1:
-                    self.logger.info("Retrying in %d seconds...", retry_delay)
-                    time.sleep(retry_delay)
-                else:
-                    self.logger.error("Server connection failed after %d attempts", max_retries)
-                    return "Error: Server connection failed. Please try again."
-
-            except Exception as e:
-                self.logger.error("Error on attempt %d: %s", attempt + 1, str(e))
-                return f"Error: {str(e)}"
+        self.context = None
+        self.context_window.reset(self.system_prompt)
+        if self.memory is not None:
+            self.memory.clear()
+        if self.world is not None:
+            self.world.reset()
+        if self.journal is not None:
+            # A new game replaces whatever was saved in the journal
+            self.journal.reset()
+            self.journal.append({"type": "start", "model": self.model_name, "system_prompt": self.system_prompt})
+            self._turns_since_snapshot = 0
+
+    def resume(self, journal):
+        """
+        Continue the session saved in a TurnJournal and keep saving to it.
+
+        Only the snapshot and the records after it are read. The saved context
+        tokens are reused when no turn was played after the snapshot, so the
+        transcript does not have to be evaluated again; otherwise the prompt
+        is rebuilt from the saved summary and recent turns. conversation_history
+        holds only those turns, the full transcript stays in the journal.
+
+        Returns:
+            str: The last reply of the saved session, or None if there was nothing to resume.
+        """
+        snapshot = journal.load_snapshot()
+        if snapshot is not None and snapshot["offset"] > journal.end:
+            # Describes records the journal no longer has
+            snapshot = None
+        if snapshot is not None:
+            system_prompt, summary, turns = snapshot["system_prompt"], snapshot["summary"], snapshot["turns"]
+            # Context tokens are specific to the model that produced them
+            context = snapshot.get("context") if snapshot.get("model") == self.model_name else None
+            records = journal.records(snapshot["offset"])
+        else:
+            system_prompt, summary, turns, context = None, "", [], None
+            records = journal.records()
+        replayed = 0
+        restarted = False
+        for _, record in records:
+            if record["type"] == "start":
+                system_prompt, summary, turns, context, replayed = record["system_prompt"], "", [], None, 0
+                restarted = True
+            elif record["type"] == "turn":
+                turns += [{"role": "user", "content": record["user"]},
+                          {"role": "assistant", "content": record["assistant"]}]
+                replayed += 1
+        if system_prompt is None:
+            return None
+        if replayed:
+            # The saved tokens do not cover the turns played after the snapshot
+            context = None
+
+        self.system_prompt = system_prompt
+        self.conversation_history = [{"role": "system", "content": system_prompt}] + turns
+        self.context = context if self.incremental else None
+        self.context_window.restore(system_prompt, summary, turns)
+        self.journal = journal
+        self._turns_since_snapshot = replayed
+        if self.memory is not None:
+            if snapshot is None or restarted or not self.memory.load(self._memory_path()):
+                self.memory.clear()
+            # Turns after the snapshot were not embedded yet when it was taken
+            for i in range(len(turns) - 2 * replayed, len(turns), 2):
+                self.memory.add(f"{turns[i]['content']}\n{turns[i + 1]['content']}")
+        if self.world is not None:
+            saved = snapshot.get("world") if snapshot is not None and not restarted else None
+            self.world.reset(WorldState.from_dict(saved) if saved else None)
+            for i in range(len(turns) - 2 * replayed, len(turns), 2):
+                self.world.update_async(turns[i]["content"], turns[i + 1]["content"])
+        self.logger.info("Resumed session from %s (%d turns after the snapshot, context %s)",
+                         journal.path, replayed, "reused" if self.context else "rebuilt")
+        self.context_window.maybe_compact()
+        return turns[-1]["content"] if turns else None
+
+    def save_snapshot(self):
+        """Save the context window and context tokens, so resuming can skip the journal up to here"""
+        if self.journal is None:
+            return
+        snapshot = dict(self.context_window.state(), model=self.model_name,
+                        system_prompt=self.system_prompt, context=self.context)
+        if self.world is not None:
+            snapshot["world"] = self.world.to_dict()
+        try:
+            if self.memory is not None:
+                self.memory.save(self._memory_path())
+            self.journal.save_snapshot(snapshot)
+            self._turns_since_snapshot = 0
+        except OSError as e:
+            self.logger.warning("Could not save the session snapshot: %s", str(e))
+
+    def resize_context(self, num_ctx):
+        """Run with another context length (Ollama reloads the model for it); the prompt budget follows"""
+        self.logger.info("Context length %s -> %d", self.options.get("num_ctx"), num_ctx)
+        self.options["num_ctx"] = num_ctx
+        self.context_window.resize(num_ctx)
+
+    def switch_model(self, model_name):
+        """Continue the session with another model, evicting the least recently used one if needed"""
+        self.logger.info("Switching model from %s to %s", self.model_name, model_name)
+        if self.models is not None:
+            self.models.use(model_name, dict(self.options))
+        self.model_name = model_name
+        # Context tokens are specific to the model that produced them
+        self.context = None
+
+    def _respond(self, user_input):
+        """Generate a response and display it to the player"""
+        if not self.stream:
+            response = self._generate_response(user_input)
+            print("\n" + response + "\n")
+            return response
+
+        print()
+        streamed = []
+
+        def on_token(token):
+            streamed.append(token)
+            print(token, end="", flush=True)
+
+        response = self._generate_response(user_input, on_token=on_token)
+        if not streamed:
+            # Nothing was streamed (e.g. an error message), show the reply as a whole
+            print(response, end="")
+        elif response.startswith("Error:"):
+            # The turn broke off mid-reply (e.g. cancelled with Ctrl+C)
+            print("\n" + response, end="")
+        print("\n")
+        return response
+
+    def cancel_turn(self):
+        """
+        Abort the turn being generated, from any thread.
+
+        The stream to the backend is closed, so the server stops generating,
+        and the turn is left out of the session.
+
+        Returns:
+            bool: Whether a turn was being generated.
+        """
+        cancel = self._turn_cancel
+        if cancel is None:
+            return False
+        cancel.set()
+        return True
+
+    def _generate_response(self, user_input, on_token=None, deadline=None, cancel=None):
+        """
+        Generate a response from the AI model
+
+        Args:
+            user_input (str): The player's action.
+            on_token (callable): Called with each piece of the reply as it arrives.
+            deadline (float): time.perf_counter() by which the turn should be done,
+                started + turn_deadline if None.
+            cancel (threading.Event): Aborts the turn when set (as does cancel_turn()).
+        """
+        if self.breaker is not None and not self.breaker.wait_closed(self.recovery_wait):
+            # The server is down and being restarted; don't queue up timeouts against it
+            self.logger.warning("Server unavailable (circuit %s), skipping turn", self.breaker.state)
+            return "Error: The server is unavailable right now. Please try again in a moment."
+        try:
+            if self.backends is None:
+                return self._run_turn(user_input, on_token, deadline, cancel)
+            with self.backends.lease(self.session_id) as backend:
+                if backend.client is not self.client:
+                    # A different server does not hold this session's KV cache
+                    self.client = backend.client
+                    self.backend = OllamaBackend(backend.client)
+                    self.context = None
+                return self._run_turn(user_input, on_token, deadline, cancel)
+
+        except TurnCancelled as e:
+            return f"Error: {e}"
+
+        except requests.exceptions.ConnectionError:
+            self.logger.error("Server connection failed")
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            return "Error: Server connection failed. Please try again."
+
+        except Exception as e:
+            self.logger.error("Error generating response: %s", str(e))
+            return f"Error: {str(e)}"
+
+    def _run_turn(self, user_input, on_token=None, deadline=None, cancel=None):
+        """Send one turn to the server and record the exchange"""
+        started = time.perf_counter()
+        if self.controller is not None and self.controller.num_ctx not in (None, self.options.get("num_ctx")):
+            self.resize_context(self.controller.num_ctx)
+        payload = self._build_payload(user_input)
+        cache_key = self._cache_key(payload, user_input)
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            generated_text, result = cached["response"], cached
+            if on_token:
+                on_token(generated_text)
+            self.last_turn_stats = {"wall_time": time.perf_counter() - started, "cached": True}
+            self.metrics.inc("response_cache_hits_total", help="Turns served from the response cache",
+                             labels={"model": self.model_name})
+            self.logger.info("Turn served from the response cache")
+        else:
+            # Connection failures are retried by the client; the turn itself is
+            # only added to the history once a reply has been received.
+            retries_before = self.backend.thread_retries()
+            generated_text, result, ttft = self._generate(payload, started, on_token if self.stream else None,
+                                                          deadline, cancel)
+            self._record_turn_stats(result, started, ttft, payload, self.backend.thread_retries() - retries_before)
+            if self.breaker is not None:
+                self.breaker.record_success()
+            if self.models is not None:
+                self.models.touch(self.model_name)
+            # A reply cut short to meet a deadline is not what the request normally produces
+            capped = payload["options"].get("num_predict") != self.options.get("num_predict")
+            if cache_key and result.get("done") and not capped:
+                self.cache.put(cache_key, {"response": generated_text, "context": result.get("context")})
+        if self.incremental and not self._compact_prompts():
+            # None after a reply cut off at the deadline: the next turn rebuilds the context
+            self.context = result.get("context")
+
+        # Add the exchange to history
+        self.conversation_history.append({"role": "user", "content": user_input})
+        self.conversation_history.append({"role": "assistant", "content": generated_text})
+        self.context_window.add("user", user_input)
+        self.context_window.add("assistant", generated_text)
+        if self.memory is not None:
+            # Embedded in the background, ready to be recalled from the next turn on
+            self.memory.add(f"{user_input}\n{generated_text}")
+        if self.world is not None:
+            # Extracted in the background, reflected in the prompt from the next turn on
+            self.world.update_async(user_input, generated_text)
+        if self.journal is not None:
+            self._save_turn(user_input, generated_text)
+        # Fold old turns into the summary while the player reads and types
+        self.context_window.maybe_compact()
+        return generated_text
+
+    def _memory_path(self):
+        return self.journal.path + ".memory"
+
+    def _save_turn(self, user_input, generated_text):
+        """Append the turn to the journal, taking a snapshot every snapshot_every turns"""
+        try:
+            self.journal.append({"type": "turn", "user": user_input, "assistant": generated_text})
+        except OSError as e:
+            # Losing the save is better than losing the turn
+            self.logger.warning("Could not save the turn: %s", str(e))
+            return
+        self._turns_since_snapshot += 1
+        if self._turns_since_snapshot >= self.snapshot_every:
+            self.save_snapshot()
+
+    def _build_payload(self, user_input):
+        """
+        Build the /api/generate request body for a turn.
+
+        In incremental mode only the new player input is sent, together with the
+        context token array from the previous turn, so Ollama can reuse the KV
+        cache for the transcript instead of evaluating it again. Otherwise the
+        prompt is built from the context window (system prompt, running summary
+        and recent turns), which keeps it within num_ctx.
+        """
+        payload = {
+            "model": self.model_name,
+            "stream": self.stream,
+            "keep_alive": self.keep_alive,
+            "options": dict(self.options),
+        }
+        if self.context and len(self.context) > self.context_window.budget:
+            # The cached context would overflow num_ctx; start over from the bounded window
+            self.logger.info("Context reached %d tokens, rebuilding it from the summary", len(self.context))
+            self.context = None
+
+        pending = {"role": "user", "content": user_input}
+        if self._compact_prompts():
+            payload["system"] = self.system_prompt
+            payload["prompt"] = self._compact_prompt(user_input)
+        elif not self.incremental:
+            # Prepare the prompt with the bounded conversation history
+            payload["prompt"] = "\n".join([msg["content"] for msg in self.context_window.build_messages(pending)])
+        elif self.context:
+            payload["prompt"] = user_input
+            payload["context"] = self.context
+        else:
+            # First turn (or a rebuild): the system prompt, the summary and the recent
+            # turns are evaluated once and become part of the context
+            messages = self.context_window.build_messages(pending)
+            payload["system"] = "\n\n".join(msg["content"] for msg in messages if msg["role"] == "system")
+            payload["prompt"] = "\n".join(msg["content"] for msg in messages if msg["role"] != "system")
+        return payload
+
+    def _compact_prompts(self):
+        """True when prompts are built from memory and/or world state instead of the history"""
+        return self.memory is not None or self.world is not None
+
+    def _compact_prompt(self, user_input):
+        """
+        Prompt made of the running summary, the world state, the past turns most
+        relevant to the input and the latest turns.
+
+        Its size depends on the state caps, top_k and recent_messages, not on
+        the length of the session.
+        """
+        recent = self.context_window.state()["turns"][-self.recent_messages:]
+        parts = []
+        summary = self.context_window.summary_message()
+        if summary:
+            parts.append(summary["content"])
+        if self.world is not None:
+            parts.append(self.world.to_prompt())
+        if self.memory is not None:
+            passages = self.memory.recall(user_input, skip_recent=len(recent) // 2)
+            if passages:
+                parts.append("Relevant earlier events:\n" + "\n\n".join(passages))
+        parts += [msg["content"] for msg in recent]
+        parts.append(user_input)
+        return "\n\n".join(parts)
+
+    def _cache_key(self, payload, user_input):
+        """
+        Response cache key for a turn, or None when the reply has to be generated.
+
+        Only requests whose reply is reproducible are cached: a fixed seed or
+        temperature 0. With cache_openings set, the opening scene is cached
+        regardless, so every player with the same genre, theme and setting
+        gets the same (instant) opening.
+        """
+        if self.cache is None:
+            return None
+        opening = user_input == self.OPENING_PROMPT and not payload.get("context")
+        if not (is_deterministic(payload["options"]) or (self.cache_openings and opening)):
+            return None
+        digest = self._model_digest()
+        if digest is None:
+            return None
+        return ResponseCache.key(digest, payload)
+
+    def _model_digest(self):
+        """Digest of the current model on the current backend, or None if it is not known there"""
+        backend_model = (self.backend.name, self.model_name)
+        digest = self.cache.digests.get(backend_model)
+        if digest is None:
+            digest = self.backend.model_digest(self.model_name)
+            if digest:
+                self.cache.digests[backend_model] = digest
+        return digest
+
+    def _summarize(self, summary, messages):
+        """Fold older turns into the running story summary (called from a background thread)"""
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = (
+            "Summarise the story of this text adventure so far for the narrator. Keep the names of "
+            "characters and places, the player's status and inventory, and any unresolved threads. "
+            "Be concise.\n\n"
+            f"Previous summary:\n{summary or '(none)'}\n\n"
+            f"New events:\n{transcript}\n\n"
+            "Updated summary:"
+        )
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "keep_alive": self.keep_alive,
+            "options": dict(self.options),
+        }
+        result = self.backend.generate(payload, timeout=(self.client.timeout[0], self.read_timeout))
+        return result["response"].strip()
+
+    def _generate(self, payload, started, on_token=None, deadline=None, cancel=None):
+        """
+        Generate the reply to a turn, within its deadline and until it is cancelled.
+
+        With a deadline, num_predict is capped to what the recent decode rate
+        can produce in the time left (the controller's rates when there is a
+        controller, which then plans for the tighter of its target and the
+        deadline), and the reply is cut off if it still runs over. Time spent on generations that are cancelled (cancel_turn,
+        the cancel event or Ctrl+C) or time out is counted as wasted.
+
+        Returns:
+            tuple: (generated text, final stats record, time to first token in seconds)
+
+        Raises:
+            TurnCancelled: The turn was aborted or its deadline passed before it started.
+        """
+        cancel = cancel or threading.Event()
+        self._turn_cancel = cancel
+        sent = None
+        try:
+            if self.model_ready is not None:
+                # Raises if the model could not be pulled or loaded
+                self.model_ready.result()
+            if deadline is None and self.turn_deadline:
+                deadline = started + self.turn_deadline
+            read_timeout = self.read_timeout
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise TurnCancelled("The turn's deadline passed before it could start.")
+                # A server that produces nothing before the deadline fails the turn then
+                read_timeout = min(read_timeout, remaining)
+            if self.controller is not None:
+                prompt_text = payload.get("system", "") + payload.get("prompt", "")
+                target = self.controller.target_latency if remaining is None \
+                    else min(self.controller.target_latency, remaining)
+                payload["options"] = self.controller.plan(
+                    payload["options"], self.context_window.counter.estimate(prompt_text) if prompt_text else 0, target)
+            elif remaining is not None:
+                payload["options"] = self._deadline_options(payload["options"], remaining)
+            if cancel.is_set():
+                raise TurnCancelled("The turn was cancelled.")
+            self.logger.debug("Sending request to server...")
+            sent = time.perf_counter()
+            generated_text, result, ttft = self._stream_request(
+                payload, started, on_token, cancel, deadline, timeout=(self.client.timeout[0], read_timeout))
+        except KeyboardInterrupt:
+            # Ctrl+C while the reply is generated aborts this turn, not the game
+            cancel.set()
+            if sent is None:
+                raise TurnCancelled("The turn was cancelled.")
+            generated_text, result = "", {"done_reason": "cancel"}
+        except requests.exceptions.ReadTimeout:
+            if sent is not None:  # Otherwise it came from the model check, and no generation was started
+                self._record_waste("timeout", sent)
+            raise
+        finally:
+            self._turn_cancel = None
+        if cancel.is_set():
+            self._record_waste("cancel", sent)
+            raise TurnCancelled("The turn was cancelled.")
+        self._update_rates(result, ttft)
+        if self.controller is not None and result.get("done"):
+            self.controller.observe(result, ttft)
+        return generated_text, result, ttft
+
+    def _deadline_options(self, options, remaining):
+        """Generation options with num_predict capped to what fits in `remaining` seconds"""
+        if not self.decode_tps:
+            # Nothing measured yet; the deadline is enforced by cutting the reply off
+            return options
+        budget = (remaining - (self.ttft or 0)) * self.decode_tps * 0.9  # Margin for rate jitter
+        budget = max(self.min_predict, int(budget))
+        num_predict = options.get("num_predict")
+        if num_predict is not None and 0 <= num_predict <= budget:
+            return options
+        self.logger.debug("Capping num_predict to %d for %.2fs left", budget, remaining)
+        return dict(options, num_predict=budget)
+
+    def _update_rates(self, result, ttft, weight=0.3):
+        """Fold a finished generation into the decode rate and ttft estimates deadlines are planned with"""
+        eval_count = result.get("eval_count", 0)
+        eval_duration = result.get("eval_duration", 0)
+        if eval_count and eval_duration:
+            tps = eval_count / (eval_duration / 1e9)
+            self.decode_tps = tps if self.decode_tps is None else (1 - weight) * self.decode_tps + weight * tps
+        if ttft is not None:
+            self.ttft = ttft if self.ttft is None else (1 - weight) * self.ttft + weight * ttft
+
+    def _record_waste(self, reason, sent):
+        """Count the generation time of an aborted request, from when it was sent"""
+        wasted = time.perf_counter() - sent
+        self.wasted_seconds += wasted
+        self.last_turn_stats = {"wall_time": wasted, "aborted": reason}
+        labels = {"model": self.model_name, "reason": reason}
+        self.metrics.inc("generations_aborted_total", help="Generations cancelled or timed out", labels=labels)
+        self.metrics.inc("generation_wasted_seconds_total", wasted,
+                         help="Time spent on generations that were cancelled or timed out", labels=labels)
+        self.logger.warning("Turn aborted (%s) after %.2fs of generation", reason, wasted)
+
+    def _stream_request(self, payload, started, on_token=None, cancel=None, deadline=None, **kwargs):
+        """
+        Post a streaming generate request and consume Ollama's NDJSON reply.
+
+        The stream is closed, which stops the server generating, when cancel
+        is set or the deadline (a time.perf_counter() value) passes; the reply
+        then ends with what was generated up to the deadline. Both are checked
+        as records arrive, so a request still waiting for its first token
+        stops at that token (or at the read timeout).
+
+        Returns:
+            tuple: (generated text, final stats record, time to first token in seconds)
+        """
+        # The read timeout applies between chunks, so long replies are not cut off
+        # as long as the model keeps producing tokens.
+        parts = []
+        ttft = None
+        final = {}
+        records = self.backend.stream(payload, cancel=cancel, **kwargs)
+        try:
+            for record in records:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    self.logger.warning("Turn deadline reached, reply cut off")
+                    self.metrics.inc("turn_deadline_cutoffs_total", help="Replies cut off at the turn deadline",
+                                     labels={"model": self.model_name})
+                    # Measured here, as the server's counts never arrive; deadlines keep learning the decode rate
+                    decoding = time.perf_counter() - started - (ttft or 0)
+                    final = {"done_reason": "deadline", "eval_count": len(parts), "eval_duration": int(decoding * 1e9)}
+                    break
+                token = record.get("response", "")
+                if token:
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    parts.append(token)
+                    if on_token:
+                        on_token(token)
+                if record.get("done"):
+                    final = record
+                    break
+        finally:
+            records.close()
+        return "".join(parts), final, ttft
+
+    def _record_turn_stats(self, result, started, ttft, payload=None, retries=0):
+        """Store the timing fields Ollama reports for a turn, plus client-side timings"""
+        wall_time = time.perf_counter() - started
+        eval_count = result.get("eval_count", 0)
+        eval_duration = result.get("eval_duration", 0)  # nanoseconds
+        prompt_text = (payload or {}).get("system", "") + (payload or {}).get("prompt", "")
+        self.last_turn_stats = {
+            "wall_time": wall_time,
+            "ttft": ttft,
+            "total_duration": result.get("total_duration", 0),
+            "load_duration": result.get("load_duration", 0),
+            "eval_count": eval_count,
+            "eval_duration": eval_duration,
+            "prompt_eval_count": result.get("prompt_eval_count", 0),
+            "prompt_eval_duration": result.get("prompt_eval_duration", 0),
+            "tokens_per_s": eval_count / (eval_duration / 1e9) if eval_duration else None,
+            "prompt_chars": len(prompt_text),
+            "prompt_tokens": self.context_window.counter.estimate(prompt_text) if prompt_text else 0,
+            "retries": retries,
+            "done_reason": result.get("done_reason"),
+            "num_predict": (payload or {}).get("options", {}).get("num_predict"),
+        }
+        self.metrics.record_turn(self.last_turn_stats, model=self.model_name)
+        self.logger.info(
+            "Turn finished in %.2fs (ttft=%s, prompt_eval_count=%d, %d tokens, %s tokens/s)",
+            wall_time,
+            "%.2fs" % ttft if ttft is not None else "n/a",
+            self.last_turn_stats["prompt_eval_count"],
+            eval_count,
+            "%.1f" % self.last_turn_stats["tokens_per_s"] if self.last_turn_stats["tokens_per_s"] else "n/a",
+        )
 
     def play(self):
         """Main game loop"""
         self.logger.info("Game started.")
         print("\nWelcome to AI Adventure!")
-        print("Type 'quit' to exit the game.\n")
-
-        self.start_game()
+        print("Type 'quit' to exit the game. Ctrl+C stops a reply that is being written.\n")
 
-        while True:
-            try:
-                # Get player input
-                user_input = input("\nWhat do you do? > ").strip()
+        resumed = self.resume(self.journal) if self.journal is not None else None
+        if resumed:
+            print("Resuming your saved adventure...\n")
+            print(resumed + "\n")
+        else:
+            self.start_game()
 
-                if user_input.lower() in ['quit', 'exit']:
-                    self.logger.info("Player exited the game.")
-                    print("\nThanks for playing!")
-                    break
+        if self.launched_at is not None:
+            self.logger.info("Cold start: %.2fs from launch to first prompt", time.perf_counter() - self.launched_at)
 
-                if not user_input:
-                    continue
+        try:
+            while True:
+                try:
+                    # Get player input
+                    user_input = input("\nWhat do you do? > ").strip()
 
-                # Generate and display response
-                response = self._generate_response(user_input)
-                print("\n" + response + "\n")
+                    if user_input.lower() in ['quit', 'exit']:
+                        self.logger.info("Player exited the game.")
+                        print("\nThanks for playing!")
+                        break
 
-            except KeyboardInterrupt:
-                self.logger.warning("Game ended by player.")
-                print("\nGame ended by player.")
-                break
-            except Exception as e:
-                self.logger.error("An error occurred: %s", str(e))
-                print(f"\nAn error occurred: {e}")
-                break
+                    if not user_input:
+                        continue
 
+                    # Generate and display response
+                    self._respond(user_input)
 
-def main():
+                except KeyboardInterrupt:
+                    self.logger.warning("Game ended by player.")
+                    print("\nGame ended by player.")
+                    break
+                except Exception as e:
+                    self.logger.error("An error occurred: %s", str(e))
+                    print(f"\nAn error occurred: {e}")
+                    break
+        finally:
+            # Resuming then starts from here instead of replaying the journal
+            self.save_snapshot()
+
+
+def _configure_from_env(game):
+    """Apply the AI_ADVENTURE_* settings shared by every way of playing in the terminal"""
+    game.cache = ResponseCache()
+    # Serve every player the same opening for a genre/theme/setting (see prewarm.py)
+    game.cache_openings = os.environ.get("AI_ADVENTURE_CACHE_OPENINGS") == "1"
+    # Seconds a turn should take at most; replies are shortened to fit
+    game.turn_deadline = float(os.environ.get("AI_ADVENTURE_TURN_DEADLINE", 0)) or None
+    if os.environ.get("AI_ADVENTURE_TARGET_LATENCY"):
+        # Size replies and the context to this many seconds per turn (see options_controller.py)
+        from python.main.GameFolder.options_controller import OptionsController, load_profile
+        game.controller = OptionsController(float(os.environ["AI_ADVENTURE_TARGET_LATENCY"]),
+                                            profile=load_profile(game.model_name))
+    if os.environ.get("AI_ADVENTURE_SAVE"):
+        # Save every turn to this file and pick the game up from it on the next launch
+        game.journal = TurnJournal(os.environ["AI_ADVENTURE_SAVE"])
+
+
+def play_in_process(model_path, launched_at):
+    """Play with a Hugging Face model loaded in this process, without an Ollama server"""
+    from python.main.GenerationBackends.transformers_backend import TransformersBackend  # Needs torch and transformers
+    backend = TransformersBackend(model_path, num_threads=int(os.environ.get("AI_ADVENTURE_THREADS", 0)) or None,
+                                  quantize=os.environ.get("AI_ADVENTURE_INT8") == "1")
+    game = AIAdventureGame(model_name=os.path.basename(os.path.normpath(model_path)), backend=backend)
+    game.launched_at = launched_at
+    _configure_from_env(game)
+    try:
+        game.play()
+    finally:
+        if game.journal is not None:
+            game.journal.close()
+
+
+def main(launched_at=None):
+    """
+    Play in the terminal. Most settings come from AI_ADVENTURE_* environment variables.
+
+    Args:
+        launched_at (float): time.perf_counter() when the program started (e.g. in the CLI), now if None.
+    """
+    launched_at = launched_at or time.perf_counter()
+    parser = argparse.ArgumentParser(description="Play AI Adventure in the terminal.")
+    parser.add_argument("--model", default="llama3.2:latest", help="Ollama model to play with")
+    parser.add_argument("--port", type=int, default=11434, help="Port of the Ollama server to start or attach to")
+    args = parser.parse_args()
+    init_logging(level=getattr(logging, os.environ.get("AI_ADVENTURE_LOG_LEVEL", "INFO").upper(), logging.INFO))
+    # Per-turn histograms: scrape /metrics while playing, JSON summary on exit
     try:
-        # Start the Ollama server
-        with ollama_service.OllamaService() as server:
-            print("Checking server health...")
+        metrics.REGISTRY.serve(port=int(os.environ.get("AI_ADVENTURE_METRICS_PORT", 9464)))
+    except OSError as e:
+        logging.getLogger('game').warning("Metrics endpoint not started: %s", str(e))
+    atexit.register(metrics.REGISTRY.dump_json, os.path.join(log_dir, "metrics.json"))
+    try:
+        if os.environ.get("AI_ADVENTURE_TRANSFORMERS_MODEL"):
+            play_in_process(os.environ["AI_ADVENTURE_TRANSFORMERS_MODEL"], launched_at)
+            return
+
+        # Start the Ollama server (or attach to one that is already running)
+        with ollama_service.OllamaService(port=args.port) as server:
+            print("Server is healthy!")
+            # Restart the server if it crashes mid-session
+            server.supervise()
+            logging.getLogger('game').info("Server ready %.2fs after launch", time.perf_counter() - launched_at)
 
-            # Initial health check
-            max_attempts = 5
-            for attempt in range(max_attempts):
-                try:
-                    response = requests.get('http://localhost:11434/api/tags')
-                    if response.status_code == 200:
-                        print("Server is healthy!")
-                        break
-                except requests.exceptions.ConnectionError:
-                    if attempt < max_attempts - 1:
-                        print(f"Server not ready, attempt {attempt + 1}/{max_attempts}")
-                        time.sleep(2)
-                    else:
-                        raise RuntimeError("Failed to connect to server")
-
-            # Verify model availability
-            response = requests.get('http://localhost:11434/api/tags')
-            models = response.json()
             print("Server is Running...")
 
-            # Make sure your model exists
-            model_name = "llama3.2:latest"  # Adjust this to match your installed model
-            game = AIAdventureGame(model_name=model_name)
-            game.play()
+            # Make sure your model exists, and load it while the intro is shown
+            model_name = args.model
+            client = get_client(server.base_url)
+            models = ModelManager(client=client)
+            game = AIAdventureGame(model_name=model_name, client=client)
+            game.launched_at = launched_at
+            game.models = models
+            game.breaker = server.breaker
+            _configure_from_env(game)
+            if os.environ.get("AI_ADVENTURE_MEMORY_MODEL"):
+                # Recall relevant past turns instead of resending the transcript (needs numpy)
+                from python.main.GameFolder.memory import TurnMemory
+                models.ensure_available(os.environ["AI_ADVENTURE_MEMORY_MODEL"])
+                game.memory = TurnMemory(client, model=os.environ["AI_ADVENTURE_MEMORY_MODEL"])
+            if os.environ.get("AI_ADVENTURE_WORLD_MODEL"):
+                # Track location, inventory and HP as structured state (a small model will do)
+                models.ensure_available(os.environ["AI_ADVENTURE_WORLD_MODEL"])
+                game.world = WorldStateTracker(client, model=os.environ["AI_ADVENTURE_WORLD_MODEL"])
+            # With the game's options, so the first turn does not reload the model for another num_ctx
+            game.model_ready = models.preload_async(model_name, dict(game.options))
+            try:
+                game.play()
+            finally:
+                models.close()
+                if game.memory is not None:
+                    game.memory.close()
+                if game.world is not None:
+                    game.world.close()
+                if game.journal is not None:
+                    game.journal.close()
 
     except Exception as e:
         print(f"Fatal error: {e}")
@@ -0,0 +1,286 @@
+"""
+Replay scripted player sessions headlessly, many at a time.
+
+Scripts are JSONL, one session per line:
+
+    {"id": "cave-1", "genre": "fantasy", "theme": "adventure", "setting": "dwarven mines",
+     "actions": ["I light a torch", "I follow the tracks", "I open the chest"]}
+
+Only "actions" is required; "id" defaults to <file>:<line>, and "model" and
+"options" override the command line for that session. Each session plays
+its opening scene and then its actions. Results are appended to the output
+file (one JSON line per session) as sessions finish, so an interrupted run
+picks up where it stopped: sessions already in the output are skipped.
+Sessions with failed turns (e.g. the server was down) are written too, but
+played again by the next run; the last line for an id is its latest attempt.
+
+    python -m python.main.GameFolder.batch_play sessions.jsonl --output results.jsonl --workers 4
+    python -m python.main.GameFolder.batch_play sessions.jsonl --output results.jsonl --fake
+    python -m python.main.GameFolder.batch_play sessions.jsonl --output results.jsonl --option seed=42 --option num_predict=200
+
+Match --workers to OLLAMA_NUM_PARALLEL (times the number of servers);
+more workers only queue inside Ollama.
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from python.main.utils.logging_config import logging, init_logging
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GameFolder.options_controller import OptionsController, load_profile
+from python.main.OllamaServerServices.ollama_client import DEFAULT_BASE_URL, get_client
+
+# Per-turn stats copied into the results
+TURN_FIELDS = ("wall_time", "ttft", "prompt_eval_count", "eval_count", "tokens_per_s", "done_reason", "cached")
+
+
+def load_scripts(paths):
+    """Read the sessions of one or more JSONL script files, in order."""
+    scripts = []
+    for path in paths:
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                script = json.loads(line)
+                if not isinstance(script.get("actions"), list):
+                    raise ValueError(f"{path}:{number}: a session needs a list of \"actions\"")
+                script.setdefault("id", f"{os.path.basename(path)}:{number}")
+                scripts.append(script)
+    return scripts
+
+
+def finished_sessions(output):
+    """
+    Ids of the sessions played without errors in a result file.
+
+    A line cut short by an interruption is removed, so appending continues
+    on a clean line.
+    """
+    if not os.path.exists(output):
+        return set()
+    with open(output, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    results = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    # A later attempt replaces an earlier one
+    latest = {result["id"]: result for result in results}
+    return {session_id for session_id, result in latest.items() if not result.get("errors")}
+
+
+class BatchRunner:
+    """
+    Plays scripted sessions on a pool of worker threads, one AIAdventureGame per session.
+
+    Sessions share the pooled client (or backend), so workers reuse
+    keep-alive connections. stop() ends the run early: sessions that have
+    not finished are dropped and replayed by the next run.
+    """
+
+    def __init__(self, model_name, workers=4, client=None, backend=None, options=None, system_prompt=None,
+                 incremental=True, target_latency=None):
+        """
+        Args:
+            model_name (str): Model sessions play with unless their script names one.
+            workers (int): Sessions played at once.
+            client (OllamaClient): Client of the server, the shared default one if None.
+            backend (GenerationBackend): Generate with this instead of the client's server.
+            options (dict): Generation options added to every session's (e.g. seed, num_predict).
+            system_prompt (str): Replaces the game's system prompt template.
+            incremental (bool): Reuse the server's KV cache across turns.
+            target_latency (float): Size each session's options to this many seconds per turn.
+        """
+        self.model_name = model_name
+        self.workers = workers
+        self.client = client or get_client()
+        self.backend = backend
+        self.options = options or {}
+        self.system_prompt = system_prompt
+        self.incremental = incremental
+        self.target_latency = target_latency
+        self._stopping = threading.Event()
+        self._games = set()  # Sessions being played, whose turn stop() cancels
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('game')
+
+    def play_session(self, script):
+        """Play one script to the end. Returns its result record, or None if the run was stopped."""
+        game = AIAdventureGame(script.get("model", self.model_name), stream=False, incremental=self.incremental,
+                               client=self.client, backend=self.backend)
+        game.options.update(self.options)
+        game.options.update(script.get("options", {}))
+        if self.system_prompt:
+            game.system_prompt = self.system_prompt
+        if self.target_latency:
+            game.controller = OptionsController(self.target_latency, profile=load_profile(game.model_name))
+        game.prepare_game(script.get("genre", "fantasy"), script.get("theme", "adventure"),
+                          script.get("setting", "medieval kingdom"))
+        with self._lock:
+            self._games.add(game)
+        started = time.perf_counter()
+        turns = []
+        try:
+            for action in [AIAdventureGame.OPENING_PROMPT] + script["actions"]:
+                if self._stopping.is_set():
+                    return None
+                game.last_turn_stats = {}  # A failed turn records none
+                reply = game._generate_response(action)
+                turn = {"input": action, "reply": reply}
+                if reply.startswith("Error:"):
+                    turn["error"] = True
+                turn.update((field, game.last_turn_stats[field]) for field in TURN_FIELDS
+                            if game.last_turn_stats.get(field) is not None)
+                turns.append(turn)
+        finally:
+            with self._lock:
+                self._games.discard(game)
+        if self._stopping.is_set():
+            return None
+        return {
+            "id": script["id"],
+            "model": game.model_name,
+            "wall_time": round(time.perf_counter() - started, 3),
+            "errors": sum(1 for turn in turns if turn.get("error")),
+            "turns": turns,
+        }
+
+    def run(self, scripts, output, on_result=None):
+        """
+        Play every script not already in the output file, appending results as sessions finish.
+
+        Args:
+            scripts (list): Sessions as returned by load_scripts.
+            output (str): JSONL result file, appended to.
+            on_result (callable): Called with each result record.
+
+        Returns:
+            dict: Throughput report of this run (see report()).
+        """
+        done = finished_sessions(output)
+        pending = [script for script in scripts if script["id"] not in done]
+        if done:
+            self.logger.info("Resuming: %d of %d sessions already played", len(scripts) - len(pending), len(scripts))
+        self._stopping.clear()
+        results = []
+        started = time.perf_counter()
+        with open(output, "a") as out, ThreadPoolExecutor(self.workers, thread_name_prefix="session") as executor:
+            futures = [executor.submit(self.play_session, script) for script in pending]
+            try:
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result is None:
+                        continue
+                    # One complete line per session, on disk before the next one is reported
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+            except BaseException:
+                # Ctrl+C or a failed session: stop the others rather than wait for them
+                self.stop()
+                executor.shutdown(cancel_futures=True)
+                raise
+        return self.report(results, time.perf_counter() - started, skipped=len(done & {s["id"] for s in scripts}))
+
+    def stop(self):
+        """Stop the run: no new turns start and the turns being generated are cancelled."""
+        self._stopping.set()
+        with self._lock:
+            games = list(self._games)
+        for game in games:
+            game.cancel_turn()
+
+    @staticmethod
+    def report(results, elapsed, skipped=0):
+        """Aggregate throughput of a run: sessions, turns/min, generated tokens/s and turn latency."""
+        turns = [turn for result in results for turn in result["turns"]]
+        latencies = sorted(turn["wall_time"] for turn in turns if "wall_time" in turn)
+        tokens = sum(turn.get("eval_count", 0) for turn in turns)
+        return {
+            "sessions": len(results),
+            "skipped": skipped,
+            "turns": len(turns),
+            "errors": sum(result["errors"] for result in results),
+            "elapsed_s": round(elapsed, 3),
+            "turns_per_min": round(len(turns) / elapsed * 60, 1) if elapsed else None,
+            "tokens_per_s": round(tokens / elapsed, 1) if elapsed else None,
+            "turn_p50_s": round(statistics.median(latencies), 4) if latencies else None,
+            "turn_p95_s": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 4)
+            if latencies else None,
+        }
+
+
+def parse_option(text):
+    """KEY=VALUE -> (key, value), the value decoded as JSON when it is valid JSON."""
+    key, _, value = text.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scripts", nargs="+", help="JSONL files with one session per line")
+    parser.add_argument("--output", required=True,
+                        help="JSONL result file; sessions already played in it without errors are skipped")
+    parser.add_argument("--model", default="llama3.2:latest")
+    parser.add_argument("--ollama-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--workers", type=int, default=4, help="Sessions played at once")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="Generation option for every session, e.g. seed=42 (repeatable)")
+    parser.add_argument("--system-prompt", help="File with a system prompt template to use instead of the game's")
+    parser.add_argument("--no-incremental", action="store_true", help="Resend the history instead of reusing context")
+    parser.add_argument("--target-latency", type=float,
+                        help="Seconds per turn to size num_predict and num_ctx to (see options_controller.py)")
+    parser.add_argument("--fake", action="store_true", help="Play against a local fake Ollama server")
+    parser.add_argument("--report", help="Also write the throughput report as JSON to this file")
+    args = parser.parse_args()
+    init_logging()
+
+    scripts = load_scripts(args.scripts)
+    system_prompt = None
+    if args.system_prompt:
+        with open(args.system_prompt) as f:
+            system_prompt = f.read()
+    fake = None
+    base_url = args.ollama_url
+    if args.fake:
+        from python.main.OllamaServerServices.fake_ollama import FakeOllama
+        fake = FakeOllama(model=args.model, num_parallel=args.workers)
+        base_url = fake.start()
+    runner = BatchRunner(args.model, workers=args.workers, client=get_client(base_url),
+                         options=dict(parse_option(option) for option in args.option),
+                         system_prompt=system_prompt, incremental=not args.no_incremental,
+                         target_latency=args.target_latency)
+
+    def on_result(result):
+        print(f"{result['id']}: {len(result['turns'])} turns in {result['wall_time']:.1f}s"
+              + (f", {result['errors']} errors" if result["errors"] else ""), flush=True)
+
+    try:
+        report = runner.run(scripts, args.output, on_result)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run again with the same --output to finish the remaining sessions.")
+        return
+    finally:
+        if fake is not None:
+            fake.stop()
+    print(f"{report['sessions']} sessions ({report['skipped']} already done), {report['turns']} turns, "
+          f"{report['errors']} errors in {report['elapsed_s']:.1f}s: {report['turns_per_min']} turns/min, "
+          f"{report['tokens_per_s']} tokens/s, turn p50 {report['turn_p50_s']}s p95 {report['turn_p95_s']}s")
+    if report["errors"]:
+        print("Sessions with errors are played again by the next run with the same --output.")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
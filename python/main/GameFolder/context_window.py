@@ -0,0 +1,196 @@
+import threading
+from collections import OrderedDict
+from python.main.utils.logging_config import logging
+
+
+class TokenCounter:
+    """
+    Count tokens per message, caching the result for each distinct text.
+
+    Without a tokenizer the count is estimated at roughly four characters per
+    token, which is close enough for budgeting English prose with Llama-style
+    vocabularies.
+    """
+
+    def __init__(self, tokenize=None, max_entries=4096):
+        """
+        Args:
+            tokenize (callable): Optional function returning the token ids of a text.
+            max_entries (int): Number of texts to keep in the cache.
+        """
+        self.tokenize = tokenize
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()  # Shared with the background summary thread
+
+    def count(self, text):
+        """Return the (possibly estimated) number of tokens in text."""
+        with self._lock:
+            cached = self._cache.get(text)
+            if cached is not None:
+                self._cache.move_to_end(text)
+                return cached
+        tokens = self.estimate(text)
+        with self._lock:
+            self._cache[text] = tokens
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def estimate(self, text):
+        """
+        Count tokens in text without the cache.
+
+        For whole prompts, which are seen once: caching them would only evict
+        the messages that are counted again every turn.
+        """
+        if self.tokenize:
+            return len(self.tokenize(text))
+        return max(1, (len(text) + 3) // 4)
+
+
+class ContextWindowManager:
+    """
+    Keep the prompt for a session within a fixed token budget.
+
+    The system prompt is always pinned at the start, the most recent turns are
+    kept verbatim, and older turns are folded into a running summary. Folding
+    runs in a background thread between turns; until it finishes, the oldest
+    verbatim turns are left out of the prompt if needed so the budget holds.
+    """
+
+    def __init__(self, summarize, num_ctx=4096, reserve_tokens=512, keep_recent=6,
+                 compact_ratio=0.75, counter=None):
+        """
+        Args:
+            summarize (callable): summarize(previous_summary, messages) -> new summary text.
+            num_ctx (int): Context length the model is run with.
+            reserve_tokens (int): Tokens left free for the model's reply.
+            keep_recent (int): Number of most recent messages that are never summarised.
+            compact_ratio (float): Fraction of the budget at which folding starts.
+            counter (TokenCounter): Token counter to use, a new one by default.
+        """
+        self.summarize = summarize
+        self.num_ctx = num_ctx
+        self.reserve_tokens = reserve_tokens
+        self.budget = num_ctx - reserve_tokens
+        self.keep_recent = keep_recent
+        self.compact_ratio = compact_ratio
+        self.compact_at = int(self.budget * compact_ratio)
+        self.counter = counter or TokenCounter()
+        self.system_prompt = ""
+        self.summary = ""
+        self.turns = []
+        self._lock = threading.Lock()
+        self._worker = None
+        self.logger = logging.getLogger('game')
+
+    def reset(self, system_prompt):
+        """Start a new session with the given system prompt."""
+        self.wait()
+        with self._lock:
+            self.system_prompt = system_prompt
+            self.summary = ""
+            self.turns = []
+
+    def resize(self, num_ctx):
+        """Budget for a new context length; a smaller window takes effect from the next prompt built."""
+        with self._lock:
+            self.num_ctx = num_ctx
+            self.budget = num_ctx - self.reserve_tokens
+            self.compact_at = int(self.budget * self.compact_ratio)
+
+    def state(self):
+        """Copy of the summary and the verbatim turns, for saving the session."""
+        with self._lock:
+            return {"summary": self.summary, "turns": list(self.turns)}
+
+    def restore(self, system_prompt, summary="", turns=()):
+        """Continue a saved session from its system prompt, summary and verbatim turns."""
+        self.wait()
+        with self._lock:
+            self.system_prompt = system_prompt
+            self.summary = summary
+            self.turns = list(turns)
+
+    def add(self, role, content):
+        """Append a message to the verbatim part of the window."""
+        with self._lock:
+            self.turns.append({"role": role, "content": content})
+
+    def summary_message(self):
+        """Return the running summary as a system message, or None if there is none yet."""
+        if not self.summary:
+            return None
+        return {"role": "system", "content": "Story so far: " + self.summary}
+
+    def build_messages(self, pending=None):
+        """
+        Return the messages to send: system prompt, summary and the recent turns that fit.
+
+        Args:
+            pending (dict): Message for the current turn that is not in the window yet.
+        """
+        with self._lock:
+            pinned = [{"role": "system", "content": self.system_prompt}]
+            summary = self.summary_message()
+            if summary:
+                pinned.append(summary)
+            used = sum(self.counter.count(msg["content"]) for msg in pinned)
+            turns = self.turns + [pending] if pending else self.turns
+            recent = []
+            for msg in reversed(turns):
+                used += self.counter.count(msg["content"])
+                if used > self.budget and recent:
+                    self.logger.debug("Context budget reached, leaving out %d older turns",
+                                      len(turns) - len(recent))
+                    break
+                recent.append(msg)
+            return pinned + recent[::-1]
+
+    def prompt_tokens(self, pending=None):
+        """Number of tokens in the prompt build_messages would return."""
+        return sum(self.counter.count(msg["content"]) for msg in self.build_messages(pending))
+
+    def total_tokens(self):
+        """Number of tokens held by the system prompt, summary and all verbatim turns."""
+        with self._lock:
+            texts = [self.system_prompt, self.summary] + [msg["content"] for msg in self.turns]
+        return sum(self.counter.count(text) for text in texts if text)
+
+    def maybe_compact(self):
+        """
+        Start folding older turns into the summary if the window is getting full.
+
+        Returns immediately; the summary is produced in a background thread.
+        """
+        if self._worker and self._worker.is_alive():
+            return
+        if self.total_tokens() <= self.compact_at:
+            return
+        with self._lock:
+            fold = self.turns[:max(0, len(self.turns) - self.keep_recent)]
+            previous = self.summary
+        if not fold:
+            return
+        self._worker = threading.Thread(target=self._compact, args=(previous, fold), daemon=True)
+        self._worker.start()
+
+    def _compact(self, previous, fold):
+        """Summarise the folded turns and drop them from the verbatim window."""
+        try:
+            summary = self.summarize(previous, fold)
+        except Exception as e:
+            self.logger.warning("Summarising older turns failed, keeping them verbatim: %s", str(e))
+            return
+        with self._lock:
+            # Turns are only ever appended, so the folded ones are still at the front
+            del self.turns[:len(fold)]
+            self.summary = summary
+        self.logger.info("Folded %d messages into the running summary (%d tokens)",
+                         len(fold), self.counter.count(summary))
+
+    def wait(self, timeout=None):
+        """Block until a running summary job has finished."""
+        if self._worker:
+            self._worker.join(timeout)
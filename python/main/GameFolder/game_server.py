@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from python.main.utils.logging_config import logging, init_logging
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GameFolder.response_cache import ResponseCache
+from python.main.OllamaServerServices.ollama_client import DEFAULT_BASE_URL, get_client
+from python.main.OllamaServerServices.backend_pool import BackendPool
+
+
+class SchedulerFull(Exception):
+    """Raised when a generation cannot be queued without exceeding the queue limits."""
+
+
+class SessionBusy(SchedulerFull):
+    """Raised when a session already has as many generations queued or running as it may."""
+
+
+class FairScheduler:
+    """
+    Bounded queue of generation jobs that round-robins across sessions.
+
+    At most max_in_flight jobs run at once (match this to OLLAMA_NUM_PARALLEL,
+    more only queues inside Ollama where it cannot be scheduled fairly). Each
+    session gets its own FIFO, and sessions take turns: a session with many
+    queued jobs cannot starve the others. A session runs one job at a time,
+    since each turn continues from the context of the one before. When the
+    queue limits are reached, submit raises SchedulerFull (SessionBusy for the
+    per-session limit) so callers can push back on clients.
+    """
+
+    def __init__(self, max_in_flight=1, max_queued=64, max_per_session=1):
+        """
+        Args:
+            max_in_flight (int): Jobs allowed to run concurrently.
+            max_queued (int): Jobs allowed to wait across all sessions.
+            max_per_session (int): Jobs allowed to wait or run for a single session.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.max_per_session = max_per_session
+        self.in_flight = 0
+        self.queued = 0
+        self._queues = {}  # session id -> deque of (job, future)
+        self._running = set()  # session ids with a job running
+        self._ring = deque()  # session ids with queued work and none running, in round-robin order
+
+    def submit(self, session_id, job):
+        """
+        Queue a job for a session.
+
+        Args:
+            session_id: Key the fairness is computed over.
+            job (callable): Coroutine function taking no arguments.
+
+        Returns:
+            asyncio.Future: Resolves to the job's result. Cancelling it cancels the job.
+        """
+        queue = self._queues.get(session_id)
+        if self.queued >= self.max_queued:
+            raise SchedulerFull(f"Too many queued generations (session {session_id})")
+        if (len(queue) if queue else 0) + (session_id in self._running) >= self.max_per_session:
+            raise SessionBusy(f"Session {session_id} already has a turn in progress")
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._queues[session_id] = deque()
+            if session_id not in self._running:
+                self._ring.append(session_id)
+        queue.append((job, future))
+        self.queued += 1
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        """Start queued jobs, taking sessions in turn, while there is capacity."""
+        while self.in_flight < self.max_in_flight and self._ring:
+            session_id = self._ring.popleft()
+            queue = self._queues[session_id]
+            job, future = queue.popleft()
+            self.queued -= 1
+            if not queue:
+                del self._queues[session_id]
+            if future.cancelled():
+                if queue:
+                    self._ring.append(session_id)
+                continue
+            self.in_flight += 1
+            self._running.add(session_id)
+            task = asyncio.ensure_future(job())
+            task.add_done_callback(lambda done, session_id=session_id, future=future:
+                                   self._finish(session_id, done, future))
+            future.add_done_callback(lambda f, task=task: task.cancel() if f.cancelled() else None)
+
+    def _finish(self, session_id, task, future):
+        self.in_flight -= 1
+        self._running.discard(session_id)
+        if session_id in self._queues:
+            self._ring.append(session_id)  # Back of the line for its next job
+        if not future.done():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        self._dispatch()
+
+
+class GameServer:
+    """
+    Hosts many AIAdventureGame sessions behind a small HTTP API.
+
+    Endpoints (JSON requests, replies streamed as server-sent events):
+        POST   /sessions              {"genre", "theme", "setting"} -> opening scene
+        POST   /sessions/<id>/turns   {"input": "..."}              -> reply
+        POST   /sessions/<id>/cancel                                -> aborts the session's current turn
+        DELETE /sessions/<id>
+        GET    /health
+
+    Streams emit one "session" event, then "token" events, then a final
+    "done" event with the turn's stats (or an "error" event).
+
+    Session and turn requests may carry "deadline", the seconds the turn
+    should take counted from its arrival (queueing included), which
+    overrides turn_deadline. A turn whose client disconnects is cancelled,
+    so the backend stops generating for nobody. A turn posted while the
+    session's previous one is still in progress is refused with 409.
+    """
+
+    def __init__(self, model_name, base_url=DEFAULT_BASE_URL, host="127.0.0.1", port=8765,
+                 max_in_flight=1, max_queued=64, backends=None, cache=None, cache_openings=False,
+                 backend=None, turn_deadline=None):
+        """
+        Args:
+            model_name (str): Model every session plays with.
+            base_url (str): Root URL of the Ollama server (ignored when backends is given).
+            host (str): Interface to listen on.
+            port (int): Port to listen on, 0 picks a free one.
+            max_in_flight (int): Concurrent generations, usually OLLAMA_NUM_PARALLEL.
+            max_queued (int): Generations allowed to wait before new turns are refused.
+            backends (BackendPool): Pool of Ollama servers to spread sessions over.
+            cache (ResponseCache): Reply cache shared by all sessions.
+            cache_openings (bool): Serve cached opening scenes even when sampling is random.
+            backend (GenerationBackend): Generate with this instead of the Ollama server at base_url.
+            turn_deadline (float): Default seconds a turn may take, unlimited if None.
+        """
+        self.model_name = model_name
+        self.client = get_client(base_url)
+        self.backends = backends
+        self.backend = backend
+        self.cache = cache
+        self.cache_openings = cache_openings
+        self.turn_deadline = turn_deadline
+        self.host = host
+        self.port = port
+        self.sessions = {}
+        self._cancels = {}  # session id -> cancel events of its queued and running turns
+        self.scheduler = FairScheduler(max_in_flight=max_in_flight, max_queued=max_queued)
+        # Generations call the blocking game API, one worker thread per in-flight slot
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="generation")
+        self._server = None
+        self.logger = logging.getLogger('game')
+
+    async def start(self):
+        """Start listening. Returns the bound (host, port)."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        self.logger.info("Game server listening on %s:%d", self.host, self.port)
+        return self.host, self.port
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self, reader, writer):
+        """Serve one HTTP request per connection."""
+        try:
+            request_line = await reader.readline()
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            body = json.loads(await reader.readexactly(length)) if length else {}
+            if not isinstance(body, dict):
+                raise ValueError("the body must be a JSON object")
+            await self._route(method, path.split("?")[0].rstrip("/"), body, writer)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            await self._send_json(writer, {"error": f"bad request: {e}"}, 400)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body, writer):
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts == ["health"]:
+            await self._send_json(writer, {
+                "sessions": len(self.sessions),
+                "in_flight": self.scheduler.in_flight,
+                "queued": self.scheduler.queued,
+                "backends": [{"url": b.base_url, "healthy": b.healthy, "in_flight": b.in_flight}
+                             for b in (self.backends.backends if self.backends else [])],
+            })
+        elif method == "POST" and parts == ["sessions"]:
+            deadline = self._deadline(body)
+            session_id = uuid.uuid4().hex
+            game = AIAdventureGame(self.model_name, client=self.client, backend=self.backend)
+            game.backends = self.backends
+            game.session_id = session_id
+            game.cache = self.cache
+            game.cache_openings = self.cache_openings
+            game.prepare_game(body.get("genre", "fantasy"), body.get("theme", "adventure"),
+                              body.get("setting", "medieval kingdom"))
+            await self._stream_turn(writer, session_id, AIAdventureGame.OPENING_PROMPT, deadline, new_game=game)
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "turns" and method == "POST":
+            if parts[1] not in self.sessions:
+                await self._send_json(writer, {"error": "unknown session"}, 404)
+                return
+            await self._stream_turn(writer, parts[1], body.get("input", ""), self._deadline(body))
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "cancel" and method == "POST":
+            await self._send_json(writer, {"cancelled": self._cancel_turn(parts[1])})
+        elif len(parts) == 2 and parts[0] == "sessions" and method == "DELETE":
+            self._cancel_turn(parts[1])
+            self.sessions.pop(parts[1], None)
+            if self.backends is not None:
+                self.backends.forget(parts[1])
+            await self._send_json(writer, {"deleted": parts[1]})
+        else:
+            await self._send_json(writer, {"error": "not found"}, 404)
+
+    def _deadline(self, body):
+        """The turn's deadline in seconds from a request body, turn_deadline if it has none."""
+        deadline = body.get("deadline", self.turn_deadline)
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                     or not deadline > 0):
+            raise ValueError("deadline must be a positive number of seconds")
+        return deadline
+
+    def _cancel_turn(self, session_id):
+        """Abort the session's queued and running turns. Returns whether there were any."""
+        cancels = [cancel for cancel in self._cancels.get(session_id, ()) if not cancel.is_set()]
+        for cancel in cancels:
+            cancel.set()
+        return bool(cancels)
+
+    async def _stream_turn(self, writer, session_id, user_input, deadline=None, new_game=None):
+        """
+        Schedule one generation for a session and stream its tokens as SSE.
+
+        new_game is the game of a session being created. It is only added to
+        the sessions once its opening turn has been accepted, so a refused
+        create leaves nothing behind.
+        """
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        game = new_game or self.sessions[session_id]
+        # Counted from now, so time spent in the queue comes out of the turn's budget
+        deadline = time.perf_counter() + deadline if deadline else None
+        cancel = threading.Event()
+
+        def on_token(token):
+            loop.call_soon_threadsafe(tokens.put_nowait, token)
+
+        async def job():
+            work = loop.run_in_executor(self._executor, game._generate_response, user_input, on_token,
+                                        deadline, cancel)
+            try:
+                return await asyncio.shield(work)
+            except asyncio.CancelledError:
+                # Stop the worker thread too, and hold the slot until the backend has let go
+                cancel.set()
+                await work
+                raise
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+        try:
+            future = self.scheduler.submit(session_id, job)
+        except SchedulerFull as e:
+            # 409 while the session's own turn is in progress, 429 when the server is full
+            await self._send_json(writer, {"error": str(e)}, 409 if isinstance(e, SessionBusy) else 429)
+            return
+        if new_game is not None:
+            self.sessions[session_id] = new_game
+        self._cancels.setdefault(session_id, set()).add(cancel)
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        try:
+            await self._send_event(writer, "session", {"session_id": session_id})
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                await self._send_event(writer, "token", {"token": token})
+            reply = await future
+            if reply.startswith("Error:"):
+                await self._send_event(writer, "error", {"error": reply})
+            else:
+                await self._send_event(writer, "done", game.last_turn_stats)
+        except ConnectionError:
+            # The player went away; drop the turn, or stop it if it is being generated
+            future.cancel()
+        finally:
+            cancels = self._cancels.get(session_id)
+            if cancels is not None:
+                cancels.discard(cancel)
+                if not cancels:
+                    del self._cancels[session_id]
+
+    @staticmethod
+    async def _send_event(writer, event, data):
+        writer.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+        # drain() blocks while the client is not reading, which slows down only that stream
+        await writer.drain()
+
+    @staticmethod
+    async def _send_json(writer, obj, status=200):
+        body = json.dumps(obj).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 409: "Conflict",
+                  429: "Too Many Requests"}.get(status, "")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+
+async def read_events(reader):
+    """Yield (event, data) pairs from a server-sent event stream."""
+    event = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        line = line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve many AI Adventure sessions against one Ollama backend.")
+    parser.add_argument("--model", default="llama3.2:latest")
+    parser.add_argument("--ollama-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-in-flight", type=int, default=1, help="Match OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--max-queued", type=int, default=64)
+    parser.add_argument("--backend", action="append", default=[],
+                        help="URL of an Ollama server to add to the backend pool (repeatable)")
+    parser.add_argument("--spawn", type=int, default=0,
+                        help="Start this many `ollama serve` processes on ports from 11435 and pool them")
+    parser.add_argument("--turn-deadline", type=float,
+                        help="Seconds a turn may take by default; replies are shortened to fit")
+    parser.add_argument("--cache-openings", action="store_true",
+                        help="Reuse cached opening scenes (see prewarm.py) instead of generating a new one per player")
+    args = parser.parse_args()
+    init_logging()
+
+    backends = None
+    if args.backend or args.spawn:
+        backends = BackendPool()
+        for url in args.backend:
+            backends.register(url)
+        if args.spawn:
+            backends.spawn(args.spawn)
+        backends.start_health_checks()
+
+    server = GameServer(args.model, base_url=args.ollama_url, host=args.host, port=args.port,
+                        max_in_flight=args.max_in_flight, max_queued=args.max_queued, backends=backends,
+                        cache=ResponseCache(), cache_openings=args.cache_openings, turn_deadline=args.turn_deadline)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nGame server stopped.")
+    finally:
+        if backends is not None:
+            backends.stop()
+
+
+if __name__ == "__main__":
+    main()
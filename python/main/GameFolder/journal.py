@@ -0,0 +1,135 @@
+import json
+import mmap
+import os
+import struct
+import zlib
+from python.main.utils.logging_config import logging
+
+MAGIC = b"AIJ1"
+# Per record: payload length and CRC32 of the payload, then the zlib-compressed JSON payload
+RECORD_HEADER = struct.Struct("<II")
+
+
+class TurnJournal:
+    """
+    Append-only log of a game session, one compressed record per turn.
+
+    Appending a turn writes one small record at the end of the file, so it
+    costs the same on turn 1000 as on turn 1. Reading maps the file and
+    decodes records on demand, starting from any offset. A torn record at
+    the end (a crash in the middle of a write) is detected by its length or
+    checksum and cut off when the journal is reopened.
+
+    Next to the journal a snapshot file holds what is needed to continue
+    without replaying everything: the context window and the Ollama context
+    tokens as of a given offset. Resuming reads the snapshot and only the
+    records written after it.
+    """
+
+    def __init__(self, path, fsync=False):
+        """
+        Args:
+            path (str): Journal file, created if missing. The snapshot goes to path + ".snapshot".
+            fsync (bool): Flush every record to disk before returning (slower, survives power loss).
+        """
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.fsync = fsync
+        self.logger = logging.getLogger('game')
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path) or os.path.getsize(path) < len(MAGIC):
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+        self._file = open(path, "r+b")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a turn journal")
+        snapshot = self._read_snapshot()
+        if snapshot and snapshot["offset"] <= os.path.getsize(path):
+            self.end = self._scan_end(snapshot["offset"])
+        else:
+            if snapshot:
+                # The journal lost records the snapshot covers (e.g. restored from an older copy).
+                # Its offset may now fall inside a record, so it must not be scanned or resumed from.
+                self.logger.warning("Discarding a snapshot past the end of %s", path)
+                os.remove(self.snapshot_path)
+            self.end = self._scan_end(len(MAGIC))
+        self._file.seek(self.end)
+        self._file.truncate()
+
+    def _scan_end(self, offset):
+        """Offset after the last complete record, checking only the records from offset on."""
+        for end, _ in self.records(offset):
+            offset = end
+        return offset
+
+    def append(self, record):
+        """Append a record (a JSON-serialisable dict). Returns the offset after it."""
+        payload = zlib.compress(json.dumps(record, separators=(",", ":")).encode())
+        self._file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.end = self._file.tell()
+        return self.end
+
+    def records(self, offset=len(MAGIC)):
+        """
+        Yield (offset after the record, record) for each complete record from offset on.
+
+        The file is memory-mapped, so only the records actually iterated over are read.
+        """
+        size = os.path.getsize(self.path)
+        if size <= offset:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            while offset + RECORD_HEADER.size <= size:
+                length, checksum = RECORD_HEADER.unpack_from(view, offset)
+                start = offset + RECORD_HEADER.size
+                payload = view[start:start + length]
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    self.logger.warning("Ignoring a torn record at offset %d of %s", offset, self.path)
+                    return
+                offset = start + length
+                yield offset, json.loads(zlib.decompress(payload))
+
+    def reset(self):
+        """Discard every record and the snapshot, to start a new game in the same file."""
+        self._file.seek(len(MAGIC))
+        self._file.truncate()
+        self._file.flush()
+        self.end = len(MAGIC)
+        if os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+
+    def save_snapshot(self, snapshot):
+        """Atomically replace the snapshot; it describes the session up to the current end of the journal."""
+        snapshot = dict(snapshot, offset=self.end)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode()))
+        os.replace(tmp_path, self.snapshot_path)
+
+    def load_snapshot(self):
+        """Return the last snapshot, or None if there is none (or it is unreadable or past the end)."""
+        snapshot = self._read_snapshot()
+        if snapshot is None or snapshot.get("offset", 0) > self.end:
+            return None
+        return snapshot
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                return json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
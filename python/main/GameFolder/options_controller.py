@@ -0,0 +1,262 @@
+"""
+Pick Ollama generation options per turn to meet a target turn latency.
+
+The controller learns the prefill and decode rates of the current machine
+from the timings Ollama reports, and before each turn chooses num_predict
+so that evaluating the prompt and writing the reply fit in the target. It
+also sizes num_ctx so that evaluating a full window takes at most half the
+target; num_ctx only changes when it is far off, since Ollama reloads the
+model whenever it changes. num_thread and num_batch come from a profile.
+
+Profiles are made by sweeping settings on this machine:
+
+    python -m python.main.GameFolder.options_controller --model llama3.2:latest
+    python -m python.main.GameFolder.options_controller --threads 4 8 16 --batch 128 512 --target 3
+    python -m python.main.GameFolder.options_controller --fake      # dry run against a fake server
+
+The best profile is saved under python/main/cache/profiles and picked up
+by the game with AI_ADVENTURE_TARGET_LATENCY set (or batch_play --target-latency).
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import time
+from python.main.utils.logging_config import logging, init_logging
+from python.main.GameFolder.response_cache import cache_dir
+from python.main.OllamaServerServices.ollama_client import DEFAULT_BASE_URL, get_client
+
+# Where swept profiles are saved, one file per model
+profile_dir = os.path.join(cache_dir, "profiles")
+
+
+def profile_path(model_name):
+    return os.path.join(profile_dir, re.sub(r"[^\w.-]", "_", model_name) + ".json")
+
+
+def load_profile(model_name, path=None):
+    """The saved profile of a model on this machine, or None if there is none."""
+    try:
+        with open(path or profile_path(model_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_profile(profile, path=None):
+    path = path or profile_path(profile["model"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+
+class OptionsController:
+    """
+    Chooses num_predict, num_ctx and (from a profile) num_thread/num_batch for each turn.
+
+    Rates are moving averages of what Ollama reports, seeded from the
+    profile when there is one. Until a rate is known the reply is only
+    capped at max_predict.
+    """
+
+    def __init__(self, target_latency, profile=None, min_predict=32, max_predict=512, min_ctx=2048,
+                 max_ctx=32768, weight=0.3):
+        """
+        Args:
+            target_latency (float): Seconds a turn should take, from request to last token.
+            profile (dict): Saved profile (see load_profile) with rates and thread/batch settings.
+            min_predict (int): Shortest reply the controller asks for, even when the target cannot be met.
+            max_predict (int): Longest reply it asks for, however fast the machine.
+            min_ctx (int): Smallest num_ctx it picks.
+            max_ctx (int): Largest num_ctx it picks.
+            weight (float): Weight of the newest measurement in the moving averages.
+        """
+        self.target_latency = target_latency
+        self.min_predict = min_predict
+        self.max_predict = max_predict
+        self.min_ctx = min_ctx
+        self.max_ctx = max_ctx
+        self.weight = weight
+        profile = profile or {}
+        self.prefill_tps = profile.get("prefill_tps")  # Prompt tokens evaluated per second
+        self.decode_tps = profile.get("decode_tps")  # Reply tokens generated per second
+        self.overhead = 0.0  # Seconds to first token beyond prompt evaluation (transport, queueing)
+        self.fixed = {name: profile[name] for name in ("num_thread", "num_batch") if profile.get(name)}
+        self.num_ctx = None  # Chosen context length, None until the prefill rate is known
+        self.last_decision = {}
+        self.logger = logging.getLogger('game')
+        self._resize_ctx()
+
+    def _average(self, current, value):
+        return value if current is None else (1 - self.weight) * current + self.weight * value
+
+    def observe(self, result, ttft=None):
+        """Fold the timings of a finished generation (an /api/generate final record) into the rates."""
+        prompt_count = result.get("prompt_eval_count", 0)
+        prompt_duration = result.get("prompt_eval_duration", 0)
+        if prompt_count >= 32 and prompt_duration:
+            # A handful of tokens says more about per-request overhead than about throughput
+            self.prefill_tps = self._average(self.prefill_tps, prompt_count / (prompt_duration / 1e9))
+        eval_count = result.get("eval_count", 0)
+        eval_duration = result.get("eval_duration", 0)
+        if eval_count and eval_duration:
+            self.decode_tps = self._average(self.decode_tps, eval_count / (eval_duration / 1e9))
+        if ttft is not None:
+            waiting = ttft - (prompt_duration + result.get("load_duration", 0)) / 1e9
+            self.overhead = self._average(self.overhead, max(0.0, waiting))
+        self._resize_ctx()
+
+    def _resize_ctx(self):
+        """Pick num_ctx so a full window is evaluated in half the target, keeping the current one unless far off."""
+        if not self.prefill_tps:
+            return
+        wanted = self.prefill_tps * self.target_latency / 2
+        if self.num_ctx is not None and self.num_ctx * 0.75 <= wanted < self.num_ctx * 2.5:
+            return
+        num_ctx = self.min_ctx
+        while num_ctx * 2 <= min(wanted, self.max_ctx):
+            num_ctx *= 2
+        if num_ctx != self.num_ctx:
+            self.logger.info("num_ctx %s -> %d (prefill %.0f tokens/s, target %.1fs); the model reloads with it",
+                             self.num_ctx, num_ctx, self.prefill_tps, self.target_latency)
+            self.num_ctx = num_ctx
+
+    def plan(self, options, prompt_tokens, target=None):
+        """
+        Options for a turn whose prompt has prompt_tokens new tokens.
+
+        Args:
+            options (dict): The session's options; num_predict there is an upper bound.
+            prompt_tokens (int): Tokens the server has to evaluate before replying.
+            target (float): Seconds for this turn, target_latency if None.
+
+        Returns:
+            dict: A copy of options with num_predict (and profile settings) filled in.
+        """
+        target = target or self.target_latency
+        upper = options.get("num_predict")
+        upper = self.max_predict if upper is None or upper < 0 else min(upper, self.max_predict)
+        prefill = prompt_tokens / self.prefill_tps if self.prefill_tps else 0.0
+        if self.decode_tps:
+            # 10% margin for rate jitter
+            num_predict = int((target - self.overhead - prefill) * self.decode_tps * 0.9)
+            num_predict = max(self.min_predict, min(upper, num_predict))
+        else:
+            num_predict = upper
+        planned = dict(options, num_predict=num_predict, **self.fixed)
+        self.last_decision = {
+            "num_predict": num_predict,
+            "num_ctx": planned.get("num_ctx"),
+            "prompt_tokens": prompt_tokens,
+            "expected_s": round(self.overhead + prefill + num_predict / self.decode_tps, 3) if self.decode_tps else None,
+        }
+        self.logger.info(
+            "Options for %.1fs: num_predict=%d num_ctx=%s for %d prompt tokens (prefill %s, decode %s tokens/s)",
+            target, num_predict, planned.get("num_ctx"), prompt_tokens,
+            "%.0f" % self.prefill_tps if self.prefill_tps else "n/a",
+            "%.1f" % self.decode_tps if self.decode_tps else "n/a",
+        )
+        return planned
+
+
+def measure(client, model, options, prompt_tokens=512, reply_tokens=64, runs=2):
+    """
+    Prefill and decode rates of a model with the given options, from Ollama's own timings.
+
+    A first request loads the model with the options (which may reload it)
+    and is not counted. Each prompt starts differently, so no run reuses
+    another's cached prompt.
+    """
+    filler = "The torchlight flickers over the damp stones of the corridor. " * (prompt_tokens // 12 + 1)
+    options = dict(options, num_predict=reply_tokens, temperature=0)
+    prefill, decode = [], []
+    for run in range(runs + 1):
+        prompt = f"Run {run} at {time.time()}: {filler}"
+        result = client.generate({"model": model, "prompt": prompt, "options": options, "keep_alive": "10m"},
+                                 timeout=(client.timeout[0], 600))
+        if run == 0:
+            continue
+        if result.get("prompt_eval_duration"):
+            prefill.append(result["prompt_eval_count"] / (result["prompt_eval_duration"] / 1e9))
+        if result.get("eval_duration"):
+            decode.append(result["eval_count"] / (result["eval_duration"] / 1e9))
+    return {
+        "prefill_tps": round(statistics.median(prefill), 1) if prefill else None,
+        "decode_tps": round(statistics.median(decode), 1) if decode else None,
+    }
+
+
+def sweep(client, model, threads=(None,), batches=(None,), prompt_tokens=512, reply_tokens=150, runs=2):
+    """
+    Measure every num_thread/num_batch combination and rank them by the time of a typical turn.
+
+    A typical turn evaluates prompt_tokens and writes reply_tokens. None
+    leaves the option at Ollama's default.
+
+    Returns:
+        list: One result dict per combination, fastest first.
+    """
+    logger = logging.getLogger('game')
+    results = []
+    for num_thread in threads:
+        for num_batch in batches:
+            options = {name: value for name, value in (("num_thread", num_thread), ("num_batch", num_batch))
+                       if value is not None}
+            rates = measure(client, model, options, prompt_tokens, reply_tokens, runs)
+            if not rates["prefill_tps"] or not rates["decode_tps"]:
+                logger.warning("No timings for %s, skipping it", options)
+                continue
+            turn = prompt_tokens / rates["prefill_tps"] + reply_tokens / rates["decode_tps"]
+            results.append(dict(rates, num_thread=num_thread, num_batch=num_batch, turn_s=round(turn, 3)))
+            logger.info("num_thread=%s num_batch=%s: prefill %.0f, decode %.1f tokens/s, turn %.2fs",
+                        num_thread, num_batch, rates["prefill_tps"], rates["decode_tps"], turn)
+    return sorted(results, key=lambda result: result["turn_s"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep generation settings on this machine and save the best profile.")
+    parser.add_argument("--model", default="llama3.2:latest")
+    parser.add_argument("--ollama-url", default=DEFAULT_BASE_URL)
+    cpus = os.cpu_count() or 1
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({max(1, cpus // 2), cpus}),
+                        help="num_thread values to try (Ollama's default is tried too)")
+    parser.add_argument("--batch", type=int, nargs="+", default=[128, 512],
+                        help="num_batch values to try (Ollama's default is tried too)")
+    parser.add_argument("--prompt-tokens", type=int, default=512, help="Prompt size of a typical turn")
+    parser.add_argument("--reply-tokens", type=int, default=150, help="Reply size of a typical turn")
+    parser.add_argument("--runs", type=int, default=2, help="Measured requests per combination")
+    parser.add_argument("--output", help="Profile file, defaults to python/main/cache/profiles/<model>.json")
+    parser.add_argument("--fake", action="store_true", help="Sweep against a local fake Ollama server")
+    args = parser.parse_args()
+    init_logging()
+
+    fake = None
+    base_url = args.ollama_url
+    if args.fake:
+        from python.main.OllamaServerServices.fake_ollama import FakeOllama
+        fake = FakeOllama(model=args.model, reply_tokens=args.reply_tokens)
+        base_url = fake.start()
+    try:
+        client = get_client(base_url)
+        results = sweep(client, args.model, [None] + args.threads, [None] + args.batch,
+                        args.prompt_tokens, args.reply_tokens, args.runs)
+    finally:
+        if fake is not None:
+            fake.stop()
+    if not results:
+        print("No combination could be measured.")
+        return
+    for result in results:
+        print(f"num_thread={str(result['num_thread']):>4} num_batch={str(result['num_batch']):>4}: "
+              f"prefill {result['prefill_tps']:8.1f}  decode {result['decode_tps']:6.1f} tokens/s  "
+              f"turn {result['turn_s']:.2f}s")
+    profile = dict(results[0], model=args.model, host=platform.node(), cpus=cpus,
+                   measured_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    print(f"Best profile saved to {save_profile(profile, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
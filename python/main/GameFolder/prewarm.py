@@ -0,0 +1,92 @@
+"""
+Generate opening scenes ahead of time so new sessions start from the response cache.
+
+Each (genre, theme, setting) combination is played up to its opening scene
+and the reply is stored in the ResponseCache. Games started with
+cache_openings (AI_ADVENTURE_CACHE_OPENINGS=1, or game_server --cache-openings)
+then open instantly for those combinations.
+
+    python -m python.main.GameFolder.prewarm
+    python -m python.main.GameFolder.prewarm --combo horror survival "abandoned asylum"
+    python -m python.main.GameFolder.prewarm --file openings.json    # [["genre", "theme", "setting"], ...]
+"""
+import argparse
+import json
+import time
+from python.main.utils.logging_config import logging, init_logging
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GameFolder.response_cache import ResponseCache
+from python.main.OllamaServerServices.model_manager import ModelManager
+from python.main.OllamaServerServices.ollama_client import DEFAULT_BASE_URL, get_client
+
+DEFAULT_COMBINATIONS = [
+    ("fantasy", "adventure", "medieval kingdom"),
+    ("science fiction", "mystery", "derelict space station"),
+    ("horror", "survival", "abandoned asylum"),
+    ("noir", "intrigue", "rain-soaked city"),
+    ("post-apocalyptic", "exploration", "overgrown ruins"),
+]
+
+
+def prewarm(model_name, combinations, cache=None, client=None):
+    """
+    Generate and cache the opening scene of each combination.
+
+    Combinations that are already cached cost one cache lookup.
+
+    Args:
+        model_name (str): Model the openings are generated with.
+        combinations (list): (genre, theme, setting) tuples.
+        cache (ResponseCache): Cache to fill, the default on-disk cache if None.
+        client (OllamaClient): Client to generate with, the shared default one if None.
+
+    Returns:
+        list: One {"genre", "theme", "setting", "seconds", "cached"} dict per combination.
+    """
+    cache = cache or ResponseCache()
+    logger = logging.getLogger('game')
+    results = []
+    for genre, theme, setting in combinations:
+        game = AIAdventureGame(model_name, stream=False, client=client)
+        game.cache = cache
+        game.cache_openings = True
+        game.prepare_game(genre, theme, setting)
+        started = time.perf_counter()
+        reply = game._generate_response(game.OPENING_PROMPT)
+        if reply.startswith("Error:"):
+            raise RuntimeError(f"Could not generate the opening for {genre}/{theme}/{setting}: {reply}")
+        seconds = time.perf_counter() - started
+        cached = game.last_turn_stats.get("cached", False)
+        logger.info("Opening for %s/%s/%s %s in %.2fs", genre, theme, setting,
+                    "already cached" if cached else "generated", seconds)
+        results.append({"genre": genre, "theme": theme, "setting": setting,
+                        "seconds": round(seconds, 3), "cached": cached})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="llama3.2:latest")
+    parser.add_argument("--ollama-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--combo", nargs=3, action="append", metavar=("GENRE", "THEME", "SETTING"),
+                        help="Combination to prewarm (repeatable), defaults to a built-in list")
+    parser.add_argument("--file", help="JSON file with a list of [genre, theme, setting] entries")
+    parser.add_argument("--cache-dir", help="Cache directory, defaults to python/main/cache")
+    args = parser.parse_args()
+    init_logging()
+
+    combinations = [tuple(combo) for combo in args.combo or []]
+    if args.file:
+        with open(args.file) as f:
+            combinations += [tuple(combo) for combo in json.load(f)]
+    combinations = combinations or DEFAULT_COMBINATIONS
+
+    client = get_client(args.ollama_url)
+    ModelManager(client=client).ensure_available(args.model)
+    for result in prewarm(args.model, combinations, ResponseCache(args.cache_dir), client):
+        state = "cached" if result["cached"] else "generated"
+        print(f"{result['genre']} / {result['theme']} / {result['setting']}: {state} in {result['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from python.main.utils.logging_config import logging
+
+# Where cached replies are stored by default, next to the logs
+cache_dir = os.path.join(os.path.dirname(__file__), '..', 'cache')
+
+# Payload fields that change what the model generates; keep_alive and stream do not
+KEY_FIELDS = ("model", "system", "prompt", "context", "options")
+
+
+def is_deterministic(options):
+    """True when the generation options make the reply reproducible (fixed seed or greedy decoding)."""
+    options = options or {}
+    return options.get("seed") is not None or options.get("temperature") == 0
+
+
+class ResponseCache:
+    """
+    Two-tier cache of generated replies: an in-memory LRU in front of a directory of JSON files.
+
+    Entries are keyed on a hash of the model digest and the request fields
+    that determine the reply, so a re-pulled model never serves stale text.
+    The disk tier is bounded in bytes and evicts the least recently read
+    files first (reads refresh a file's modification time).
+    """
+
+    def __init__(self, directory=None, max_entries=256, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            directory (str): Where the disk tier lives, defaults to python/main/cache.
+            max_entries (int): Entries kept in memory.
+            max_bytes (int): Total size of the disk tier before old entries are evicted.
+        """
+        self.directory = directory or cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.digests = {}  # (base URL, model name) -> model digest, looked up once per cache user
+        self._memory = OrderedDict()  # key -> entry, least recently used first
+        self._lock = threading.Lock()  # Sessions of the game server share one cache
+        self._disk_bytes = None  # Computed on first write
+        self.logger = logging.getLogger('game')
+
+    @staticmethod
+    def key(digest, payload):
+        """Cache key for a generate payload produced by a model with the given digest."""
+        fields = {name: payload.get(name) for name in KEY_FIELDS}
+        fields["digest"] = digest
+        encoded = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the cached entry for key, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # Mark as recently used for eviction
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry (a JSON-serialisable dict) in both tiers."""
+        with self._lock:
+            self._remember(key, entry)
+        path = self._path(key)
+        data = json.dumps(entry).encode()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so a crash never leaves a truncated entry behind
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning("Could not write cache entry %s: %s", key, str(e))
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_entries(self):
+        """(path, size, mtime) of every entry on disk."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Remove the least recently used files until the disk tier is below 90% of max_bytes."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            self._memory.pop(os.path.basename(path)[:-len(".json")], None)
+        self._disk_bytes = total
+        self.logger.info("Evicted %d cached replies, %d bytes left on disk", removed, total)
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            for path, _, _ in self._disk_entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._disk_bytes = 0
@@ -0,0 +1,166 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from python.main.utils.logging_config import logging
+from python.main.utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+# JSON schema the extraction call is constrained to (Ollama structured outputs)
+STATE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "location": {"type": "string"},
+        "inventory": {"type": "array", "items": {"type": "string"}},
+        "hp": {"type": "integer"},
+        "flags": {"type": "object", "additionalProperties": {"type": "string"}},
+        "npcs": {"type": "object", "additionalProperties": {"type": "string"}},
+    },
+    "required": ["location", "inventory", "hp", "flags", "npcs"],
+}
+
+# Caps that keep the serialised state to a few hundred tokens
+MAX_ITEMS = 20
+MAX_ENTRIES = 12
+MAX_TEXT = 80
+
+
+class WorldState:
+    """
+    Slot-based state of the game world: where the player is, what they carry and who they know.
+
+    Rendered into the prompt in place of the prose that would otherwise have
+    to stay in context for the model to keep track of these things.
+    """
+
+    def __init__(self, location="", inventory=(), hp=100, flags=None, npcs=None):
+        self.location = location
+        self.inventory = list(inventory)
+        self.hp = hp
+        self.flags = dict(flags or {})  # e.g. {"gate": "unlocked"}
+        self.npcs = dict(npcs or {})  # name -> short note
+
+    def to_dict(self):
+        return {"location": self.location, "inventory": list(self.inventory), "hp": self.hp,
+                "flags": dict(self.flags), "npcs": dict(self.npcs)}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.apply(data)
+        return state
+
+    def apply(self, data):
+        """Take the well-formed fields of an extracted state; anything malformed is ignored."""
+        if isinstance(data.get("location"), str):
+            self.location = data["location"][:MAX_TEXT]
+        if isinstance(data.get("inventory"), list):
+            self.inventory = [str(item)[:MAX_TEXT] for item in data["inventory"] if item][:MAX_ITEMS]
+        if isinstance(data.get("hp"), (int, float)) and not isinstance(data.get("hp"), bool):
+            self.hp = max(0, min(100, int(data["hp"])))
+        for field in ("flags", "npcs"):
+            if isinstance(data.get(field), dict):
+                entries = {str(key)[:MAX_TEXT]: str(value)[:MAX_TEXT] for key, value in data[field].items()}
+                setattr(self, field, dict(list(entries.items())[:MAX_ENTRIES]))
+
+    def to_prompt(self):
+        """Compact text form of the state for the prompt."""
+        lines = ["Current world state (keep the story consistent with it):"]
+        lines.append(f"Location: {self.location or 'unknown'}")
+        lines.append(f"HP: {self.hp}/100")
+        lines.append("Inventory: " + (", ".join(self.inventory) or "nothing"))
+        if self.npcs:
+            lines.append("Known characters: " + "; ".join(f"{name} ({note})" for name, note in self.npcs.items()))
+        if self.flags:
+            lines.append("Facts: " + "; ".join(f"{key}: {value}" for key, value in self.flags.items()))
+        return "\n".join(lines)
+
+
+class WorldStateTracker:
+    """
+    Keeps a WorldState up to date by asking a model to extract it after every reply.
+
+    Extraction is a non-streaming generate call constrained to STATE_SCHEMA
+    with temperature 0, run on a background thread one turn at a time, so
+    it never delays the reply. A small model is enough for it. Until an
+    extraction finishes the previous state is used; the latest turns are in
+    the prompt verbatim anyway.
+    """
+
+    def __init__(self, client, model, keep_alive="30m", num_predict=256):
+        """
+        Args:
+            client (OllamaClient): Client of the server that runs the extraction.
+            model (str): Model used for extraction.
+            keep_alive (str | int): How long the extraction model stays loaded.
+            num_predict (int): Token limit of an extraction reply.
+        """
+        self.client = client
+        self.model = model
+        self.keep_alive = keep_alive
+        self.num_predict = num_predict
+        self.state = WorldState()
+        self.last_prompt_tokens = 0  # prompt_eval_count of the latest extraction
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="world-state")
+        self._pending = []
+        self.logger = logging.getLogger('game')
+
+    def reset(self, state=None):
+        self.wait()
+        with self._lock:
+            self.state = state or WorldState()
+
+    def to_prompt(self):
+        with self._lock:
+            return self.state.to_prompt()
+
+    def to_dict(self):
+        with self._lock:
+            return self.state.to_dict()
+
+    def update_async(self, user_input, reply):
+        """Extract the state after a turn in the background. Returns a Future."""
+        future = self._executor.submit(self._update, user_input, reply)
+        self._pending = [f for f in self._pending if not f.done()] + [future]
+        return future
+
+    def _update(self, user_input, reply):
+        with self._lock:
+            current = self.state.to_dict()
+        prompt = (
+            "You keep track of the state of a text adventure.\n"
+            f"State before the turn:\n{json.dumps(current)}\n\n"
+            f"Player: {user_input}\nNarrator: {reply}\n\n"
+            "Return the state after the turn as JSON. Update the location if the player moved, add items "
+            "they obtained and remove items they lost or used, set hp (0-100) from injuries or healing, "
+            "keep named characters they met with a short note, and keep facts that matter later "
+            "(doors opened, quests accepted) as short key/value pairs."
+        )
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "format": STATE_SCHEMA,
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": 0, "num_predict": self.num_predict},
+        }
+        try:
+            result = self.client.generate(payload)
+            extracted = json.loads(result["response"])
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            self.logger.warning("World state extraction failed, keeping the previous state: %s", str(e))
+            return
+        if not isinstance(extracted, dict):
+            return
+        with self._lock:
+            self.state.apply(extracted)
+            self.last_prompt_tokens = result.get("prompt_eval_count", 0)
+
+    def wait(self):
+        """Block until every extraction submitted so far has finished."""
+        for future in list(self._pending):
+            future.result()
+        self._pending = []
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,53 @@
+class GenerationBackend:
+    """
+    Interface the game generates text through.
+
+    Requests and replies use the shape of Ollama's /api/generate, which the
+    rest of the game already speaks: a payload with model, system, prompt,
+    optional context tokens and options, and records with "response",
+    "done", the final one carrying "context" and the timing/count fields.
+    Backends that run in process fill in what they can measure.
+
+    A generation stops early when its `cancel` event is set or when the
+    stream generator is closed.
+    """
+
+    # Identifies the backend instance, e.g. in cache keys
+    name = "backend"
+
+    def stream(self, payload, cancel=None, **kwargs):
+        """
+        Yield the records of a generation as tokens are produced.
+
+        Args:
+            payload (dict): /api/generate-style request.
+            cancel (threading.Event): Stops the generation when set.
+            **kwargs: Transport options (e.g. an HTTP timeout), ignored by in-process backends.
+        """
+        raise NotImplementedError
+
+    def generate(self, payload, cancel=None, **kwargs):
+        """Run a generation to the end and return the final record, with the full text in "response"."""
+        parts = []
+        final = {}
+        records = self.stream(payload, cancel=cancel, **kwargs)
+        try:
+            for record in records:
+                parts.append(record.get("response", ""))
+                if record.get("done"):
+                    final = record
+                    break
+        finally:
+            records.close()
+        return dict(final, response="".join(parts), done=bool(final))
+
+    def model_digest(self, model):
+        """Identifier of the exact model weights, or None if the model is not available."""
+        return None
+
+    def thread_retries(self):
+        """Transport retries made so far by the calling thread (0 for backends without a transport)."""
+        return 0
+
+    def close(self):
+        pass
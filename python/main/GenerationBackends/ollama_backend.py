@@ -0,0 +1,44 @@
+from python.main.GenerationBackends.base import GenerationBackend
+from python.main.OllamaServerServices.ollama_client import get_client
+from python.main.utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+
+class OllamaBackend(GenerationBackend):
+    """Generates through an Ollama server's /api/generate over a pooled OllamaClient."""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client (OllamaClient): Client of the server, the shared default one if None.
+        """
+        self.client = client or get_client()
+        self.name = self.client.base_url
+
+    def stream(self, payload, cancel=None, **kwargs):
+        records = self.client.stream("/api/generate", payload, **kwargs)
+        try:
+            for record in records:
+                if cancel is not None and cancel.is_set():
+                    break
+                yield record
+        finally:
+            # Closing the response makes Ollama stop generating
+            records.close()
+
+    def generate(self, payload, cancel=None, **kwargs):
+        if cancel is None:
+            # One JSON reply instead of a record per token
+            return self.client.generate(payload, **kwargs)
+        return super().generate(payload, cancel=cancel, **kwargs)
+
+    def model_digest(self, model):
+        try:
+            models = {entry["name"]: entry for entry in self.client.tags().get("models", [])}
+        except requests.exceptions.RequestException:
+            return None
+        return models.get(model, {}).get("digest")
+
+    def thread_retries(self):
+        return self.client.thread_retries()
@@ -0,0 +1,59 @@
+import time
+import zlib
+from python.main.GenerationBackends.base import GenerationBackend
+
+
+class StubBackend(GenerationBackend):
+    """
+    Deterministic in-process backend for tests and benchmarks.
+
+    The reply depends only on the prompt, so the same request always gets
+    the same text. Token counts use the game's four-characters-per-token
+    estimate, and context tokens are carried over like Ollama does, so
+    incremental mode behaves as it would against a server.
+    """
+
+    name = "stub"
+
+    def __init__(self, reply_tokens=40, token_delay=0.0):
+        """
+        Args:
+            reply_tokens (int): Tokens per reply unless options.num_predict is lower.
+            token_delay (float): Seconds to sleep per generated token.
+        """
+        self.reply_tokens = reply_tokens
+        self.token_delay = token_delay
+
+    def stream(self, payload, cancel=None, **kwargs):
+        started = time.perf_counter_ns()
+        text = payload.get("system", "") + payload.get("prompt", "")
+        prompt_tokens = max(1, (len(text) + 3) // 4) if text else 0
+        seed = zlib.crc32(text.encode())
+        num_predict = (payload.get("options") or {}).get("num_predict")
+        count = self.reply_tokens if num_predict is None or num_predict < 0 else min(self.reply_tokens, num_predict)
+        decode_started = time.perf_counter_ns()
+        generated = 0
+        for i in range(count):
+            if cancel is not None and cancel.is_set():
+                break
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            generated += 1
+            yield {"model": payload.get("model"), "response": f"word{(seed + i) % 1000} ", "done": False}
+        context = list(payload.get("context") or []) + list(range(prompt_tokens + generated))
+        yield {
+            "model": payload.get("model"),
+            "response": "",
+            "done": True,
+            "done_reason": "stop" if generated == count else "cancel",
+            "context": context,
+            "total_duration": time.perf_counter_ns() - started,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": decode_started - started,
+            "eval_count": generated,
+            "eval_duration": time.perf_counter_ns() - decode_started,
+        }
+
+    def model_digest(self, model):
+        return f"stub-{model}"
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from python.main.GenerationBackends.base import GenerationBackend
+from python.main.utils.logging_config import logging
+
+
+class TransformersBackend(GenerationBackend):
+    """
+    In-process generation with a Hugging Face causal LM, loaded once.
+
+    On a single box this drops the HTTP round trip and the JSON record per
+    token. Like Ollama, replies carry the conversation's token ids as
+    "context". The attention cache (past_key_values) of the last few
+    conversations is kept, so a request that continues one only runs its
+    new tokens through the model instead of the whole transcript.
+
+    Prompts are tokenised as plain text (system prompt, a blank line, then
+    the prompt), without the model's chat template. Needs torch and
+    transformers, which are imported only when this backend is created.
+    """
+
+    def __init__(self, model_path, num_threads=None, quantize=False, max_sessions=4, local_files_only=True):
+        """
+        Args:
+            model_path (str): Directory (or hub id) of the model and tokenizer.
+            num_threads (int): CPU threads torch may use, torch's default if None.
+            quantize (bool): Apply dynamic int8 quantisation to the Linear layers (CPU).
+            max_sessions (int): Conversations whose attention cache is kept.
+            local_files_only (bool): Never download, only load from disk.
+        """
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.logger = logging.getLogger('game')
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        started = time.perf_counter()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=local_files_only)
+        model = AutoModelForCausalLM.from_pretrained(model_path, local_files_only=local_files_only,
+                                                     low_cpu_mem_usage=True)
+        model.eval()
+        if quantize:
+            # int8 weights for the Linear layers, activations quantised on the fly
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.load_seconds = time.perf_counter() - started
+        self.model_path = model_path
+        self.quantize = quantize
+        self.max_sessions = max_sessions
+        self.name = f"transformers:{os.path.abspath(model_path)}"
+        self._caches = OrderedDict()  # tuple of token ids run through the model -> past_key_values
+        self._lock = threading.Lock()  # The model and the caches serve one generation at a time
+        self.logger.info("Loaded %s in %.1fs (%d threads, int8=%s)", model_path, self.load_seconds,
+                         torch.get_num_threads(), quantize)
+
+    def _take_cache(self, ids):
+        """Remove and return (length, past_key_values) of the longest cached strict prefix of ids."""
+        best = None
+        for key in self._caches:
+            if len(key) < len(ids) and (best is None or len(key) > len(best)) and tuple(ids[:len(key)]) == key:
+                best = key
+        if best is None:
+            return 0, None
+        # Generation extends the cache in place, so it now belongs to this request
+        return len(best), self._caches.pop(best)
+
+    def _store_cache(self, ids, past):
+        self._caches[tuple(ids)] = past
+        while len(self._caches) > self.max_sessions:
+            self._caches.popitem(last=False)
+
+    def _forward(self, ids, past):
+        with self.torch.inference_mode():
+            out = self.model(input_ids=self.torch.tensor([ids]), past_key_values=past, use_cache=True)
+        return out.logits[0, -1], out.past_key_values
+
+    def _sample(self, logits, options, generator):
+        """Pick the next token with Ollama's sampling options (temperature, top_k, top_p)."""
+        torch = self.torch
+        temperature = options.get("temperature", 0.8)
+        if temperature <= 0:
+            return int(torch.argmax(logits))
+        logits = logits.float() / temperature
+        top_k = options.get("top_k", 40)
+        values, indices = torch.topk(logits, min(top_k, logits.shape[-1])) if top_k > 0 \
+            else torch.sort(logits, descending=True)
+        probs = torch.softmax(values, dim=-1)
+        top_p = options.get("top_p", 0.9)
+        if top_p < 1:
+            # Keep the smallest set of tokens whose probability adds up to top_p
+            probs = probs * ((probs.cumsum(dim=-1) - probs) < top_p)
+            probs = probs / probs.sum()
+        return int(indices[torch.multinomial(probs, 1, generator=generator)])
+
+    def stream(self, payload, cancel=None, **kwargs):
+        started = time.perf_counter_ns()
+        options = payload.get("options") or {}
+        context = list(payload.get("context") or [])
+        text = payload.get("prompt", "")
+        if payload.get("system") and not context:
+            text = payload["system"] + "\n\n" + text
+        ids = context + self.tokenizer(text, add_special_tokens=not context)["input_ids"]
+        num_predict = options.get("num_predict", 256)
+        if num_predict is None or num_predict < 0:
+            num_predict = 2048
+        generator = None
+        if options.get("seed") is not None:
+            generator = self.torch.Generator().manual_seed(int(options["seed"]))
+
+        with self._lock:
+            start, past = self._take_cache(ids)
+            fed = None  # Tokens covered by past, once the prompt has been run
+            generated = []
+            reason = "length"
+            try:
+                logits, past = self._forward(ids[start:], past)
+                fed = list(ids)
+                decode_started = time.perf_counter_ns()
+                emitted = ""
+                while len(generated) < num_predict:
+                    if cancel is not None and cancel.is_set():
+                        reason = "cancel"
+                        break
+                    next_id = self._sample(logits, options, generator)
+                    if next_id == self.tokenizer.eos_token_id:
+                        reason = "stop"
+                        break
+                    generated.append(next_id)
+                    decoded = self.tokenizer.decode(generated, skip_special_tokens=True)
+                    # Hold back a partial multi-byte character until the next token completes it
+                    if len(decoded) > len(emitted) and not decoded.endswith("\ufffd"):
+                        yield {"model": payload.get("model"), "response": decoded[len(emitted):], "done": False}
+                        emitted = decoded
+                    if len(generated) < num_predict:
+                        logits, past = self._forward([next_id], past)
+                        fed.append(next_id)
+                decoded = self.tokenizer.decode(generated, skip_special_tokens=True)
+                if len(decoded) > len(emitted):
+                    yield {"model": payload.get("model"), "response": decoded[len(emitted):], "done": False}
+            finally:
+                # Also after a cancel or an early close; a failed prompt run may have left the cache half-extended
+                if fed is not None:
+                    self._store_cache(fed, past)
+
+        yield {
+            "model": payload.get("model"),
+            "response": "",
+            "done": True,
+            "done_reason": reason,
+            "context": ids + generated,
+            "total_duration": time.perf_counter_ns() - started,
+            "load_duration": 0,
+            "prompt_eval_count": len(ids) - start,
+            "prompt_eval_duration": decode_started - started,
+            "eval_count": len(generated),
+            "eval_duration": time.perf_counter_ns() - decode_started,
+        }
+
+    def model_digest(self, model):
+        return f"{self.name}|int8={self.quantize}"
@@ -1,50 +1,72 @@
-from python.main.OllamaServerServices.ollama_service import OllamaService
-import requests
+import argparse
 import time
+from python.main.OllamaServerServices.ollama_service import OllamaService
+from python.main.OllamaServerServices.ollama_client import get_client
+from python.main.utils.logging_config import init_logging
 
 
-def wait_for_server():
+def wait_for_server(server, timeout=30):
     """Wait for Ollama server to be ready"""
-    max_attempts = 30
     print("Checking server health...")
-    for attempt in range(max_attempts):
-        try:
-            print(f"Health check attempt {attempt + 1}/{max_attempts}")
-            response = requests.get('http://localhost:11434/api/tags')
-            if response.status_code == 200:
-                print("OllamaServerServices health check succeeded!")
-                return True
-        except requests.exceptions.ConnectionError:
-            print(f"OllamaServerServices not ready yet, waiting... (attempt {attempt + 1})")
-            time.sleep(1)
-    return False
-
-
-# Start the server
-print("Initializing Ollama server...")
-with OllamaService() as server:
-    # Check if process started successfully
-    if server.process is None or server.process.poll() is not None:
-        print("OllamaServerServices process failed to start or terminated immediately")
-        # Get any error output
-        if server.process:
-            _, stderr = server.process.communicate()
-            print(f"OllamaServerServices error output: {stderr}")
-    else:
-        print("OllamaServerServices process is running, checking if it's responsive...")
-
-        # Wait longer for server to be ready
-        if wait_for_server():
-            print("OllamaServerServices is ready!")
-            try:
-                response = requests.get('http://localhost:11434/api/tags')
-                print("Available models:", response.json())
-            except Exception as e:
-                print(f"Error making API call: {e}")
-
-            print("Keeping server running for testing...")
-            time.sleep(60)
+    try:
+        server.wait_until_ready(timeout)
+    except RuntimeError as e:
+        print(f"OllamaServerServices not ready: {e}")
+        return False
+    print("OllamaServerServices health check succeeded!")
+    return True
+
+
+def check(hold=0):
+    """
+    Start (or attach to) the Ollama server, check that it answers and list its models.
+
+    Args:
+        hold (float): Seconds to keep the server running afterwards, for testing against it.
+
+    Returns:
+        bool: Whether the server became healthy.
+    """
+    print("Initializing Ollama server...")
+    healthy = False
+    with OllamaService() as server:
+        # Check if process started successfully (or an existing server was attached)
+        if not server.attached and (server.process is None or server.process.poll() is not None):
+            print("OllamaServerServices process failed to start or terminated immediately")
+            # Get any error output
+            if server.process:
+                _, stderr = server.process.communicate()
+                print(f"OllamaServerServices error output: {stderr}")
         else:
-            print("OllamaServerServices failed to respond to health checks")
+            print("OllamaServerServices process is running, checking if it's responsive...")
+
+            # Wait longer for server to be ready
+            if wait_for_server(server):
+                healthy = True
+                print("OllamaServerServices is ready!")
+                try:
+                    print("Available models:", get_client(server.base_url).tags())
+                except Exception as e:
+                    print(f"Error making API call: {e}")
+
+                if hold:
+                    print("Keeping server running for testing...")
+                    time.sleep(hold)
+            else:
+                print("OllamaServerServices failed to respond to health checks")
+
+    print("Script completed")
+    return healthy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start or attach to the Ollama server and check that it is healthy.")
+    parser.add_argument("--hold", type=float, default=0,
+                        help="Seconds to keep the server running after the check")
+    args = parser.parse_args()
+    init_logging()
+    raise SystemExit(0 if check(args.hold) else 1)
+
 
-print("Script completed")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import threading
+from contextlib import contextmanager
+from python.main.utils.logging_config import logging
+from python.main.OllamaServerServices.ollama_client import get_client
+from python.main.OllamaServerServices.ollama_service import OllamaService
+from python.main.utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+
+class NoHealthyBackend(RuntimeError):
+    """Raised when every backend in the pool is ejected."""
+
+
+class Backend:
+    """One Ollama endpoint in a BackendPool."""
+
+    def __init__(self, base_url, service=None):
+        """
+        Args:
+            base_url (str): Root URL of the Ollama server.
+            service (OllamaService): The process behind it, if the pool spawned it.
+        """
+        self.base_url = base_url
+        self.client = get_client(base_url)
+        self.service = service
+        self.healthy = True
+        self.in_flight = 0
+        self.sessions = 0  # Sessions pinned to this backend
+
+    def __repr__(self):
+        return f"Backend({self.base_url!r}, healthy={self.healthy}, in_flight={self.in_flight})"
+
+
+class BackendPool:
+    """
+    Route generations across several Ollama servers.
+
+    Each session is pinned to the backend that served it last, because that is
+    where its KV cache lives; it only moves if that backend is ejected. New
+    sessions go to the healthy backend with the fewest generations in flight.
+    Backends are ejected when a request to them fails or an active health check
+    fails, and re-admitted once a health check succeeds again.
+    """
+
+    def __init__(self, health_interval=5.0):
+        """
+        Args:
+            health_interval (float): Seconds between active health checks.
+        """
+        self.health_interval = health_interval
+        self.backends = []
+        self._affinity = {}  # session id -> Backend
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._checker = None
+        self.logger = logging.getLogger('server')
+
+    def register(self, base_url, service=None):
+        """Add an existing Ollama endpoint to the pool."""
+        backend = Backend(base_url, service)
+        with self._lock:
+            self.backends.append(backend)
+        self.logger.info("Registered backend %s", base_url)
+        return backend
+
+    def spawn(self, count, base_port=11435, host="127.0.0.1", ollama_path="ollama"):
+        """
+        Start count `ollama serve` processes on consecutive ports and add them.
+
+        The processes are started in parallel and this returns once all are ready.
+        """
+        services = [OllamaService(ollama_path, host=host, port=base_port + i) for i in range(count)]
+        threads = [threading.Thread(target=service.start) for service in services]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [self.register(service.base_url, service) for service in services
+                if service.attached or service.process is not None]
+
+    def acquire(self, session_id=None):
+        """
+        Pick the backend for a generation and count it as in flight.
+
+        Raises:
+            NoHealthyBackend: If no backend is currently healthy.
+        """
+        with self._lock:
+            backend = self._affinity.get(session_id)
+            if backend is None or not backend.healthy:
+                healthy = [b for b in self.backends if b.healthy]
+                if not healthy:
+                    raise NoHealthyBackend("No healthy Ollama backend available")
+                previous = backend
+                backend = min(healthy, key=lambda b: (b.in_flight, b.sessions))
+                if session_id is not None:
+                    if previous is not None:
+                        previous.sessions -= 1
+                        self.logger.info("Moving session %s from %s to %s",
+                                         session_id, previous.base_url, backend.base_url)
+                    backend.sessions += 1
+                    self._affinity[session_id] = backend
+            backend.in_flight += 1
+            return backend
+
+    def release(self, backend, failed=False):
+        """Finish a generation; a failed one ejects the backend until it passes a health check."""
+        with self._lock:
+            backend.in_flight -= 1
+            if failed and backend.healthy:
+                backend.healthy = False
+                self.logger.warning("Ejecting backend %s after a failed request", backend.base_url)
+
+    @contextmanager
+    def lease(self, session_id=None):
+        """Context manager around acquire/release; connection errors eject the backend."""
+        backend = self.acquire(session_id)
+        failed = False
+        try:
+            yield backend
+        except requests.exceptions.ConnectionError:
+            failed = True
+            raise
+        finally:
+            self.release(backend, failed)
+
+    def forget(self, session_id):
+        """Drop a finished session's pinning."""
+        with self._lock:
+            backend = self._affinity.pop(session_id, None)
+            if backend is not None:
+                backend.sessions -= 1
+
+    def check_health(self):
+        """Probe every backend once, ejecting or re-admitting it."""
+        for backend in list(self.backends):
+            healthy = backend.client.is_healthy()
+            if healthy != backend.healthy:
+                self.logger.warning("%s backend %s", "Re-admitting" if healthy else "Ejecting", backend.base_url)
+            backend.healthy = healthy
+
+    def start_health_checks(self):
+        """Run check_health every health_interval seconds in a background thread."""
+        def loop():
+            while not self._stop.wait(self.health_interval):
+                self.check_health()
+
+        self._checker = threading.Thread(target=loop, name="backend-health", daemon=True)
+        self._checker.start()
+
+    def stop(self):
+        """Stop health checks and any servers the pool spawned."""
+        self._stop.set()
+        for backend in self.backends:
+            if backend.service is not None:
+                backend.service.stop()
+
+    def __enter__(self):
+        self.start_health_checks()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
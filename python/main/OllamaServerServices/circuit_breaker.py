@@ -0,0 +1,106 @@
+import threading
+import time
+from python.main.utils.logging_config import logging
+
+
+class CircuitBreaker:
+    """
+    Tracks whether the Ollama server is worth sending requests to.
+
+    closed:    requests go through; consecutive failures are counted.
+    open:      the server is known to be down, requests should fail fast
+               (or wait for recovery) instead of timing out one by one.
+    half_open: reset_timeout has passed since the breaker opened; one trial
+               request is let through and its outcome closes or re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the breaker.
+            reset_timeout (float): Seconds after opening before a trial request is allowed.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+        self._changed = threading.Condition()
+        self.logger = logging.getLogger('server')
+
+    @property
+    def state(self):
+        with self._changed:
+            if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            return self._state
+
+    def allow_request(self):
+        """Return True if a request may be sent now."""
+        state = self.state
+        with self._changed:
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """Close the breaker after a successful request or health check."""
+        with self._changed:
+            if self._state != self.CLOSED:
+                self.logger.info("Circuit breaker closed")
+            self._state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+            self._changed.notify_all()
+
+    def record_failure(self):
+        """Count a failed request; opens the breaker once the threshold is reached."""
+        with self._changed:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._open(f"{self.failures} failed requests")
+
+    def trip(self, reason="tripped"):
+        """
+        Open the breaker immediately (e.g. the server process exited).
+
+        Args:
+            reason (str): Why, for the log.
+        """
+        with self._changed:
+            self._open(reason)
+
+    def _open(self, reason):
+        if self._state != self.OPEN:
+            self.logger.warning("Circuit breaker opened: %s", reason)
+        self._state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def wait_closed(self, timeout=None):
+        """
+        Block until the breaker closes or timeout seconds pass.
+
+        Returns:
+            bool: True if requests may be sent.
+        """
+        if self.allow_request():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while self._state != self.CLOSED:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+        return True
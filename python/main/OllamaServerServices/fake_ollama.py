@@ -0,0 +1,436 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from python.main.utils.logging_config import logging
+
+
+class InjectedFailure(Exception):
+    """Raised inside the fake when failure injection decides a request should fail."""
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is normal, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def parse_keep_alive(value, default=300.0):
+    """Convert an Ollama keep_alive value ("30m", "10s", 0, -1...) to seconds; negative means forever."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"\s*(-?[\d.]+)\s*(ms|s|m|h)?\s*", str(value))
+    if not match:
+        return default
+    number, unit = float(match.group(1)), match.group(2) or "s"
+    return number * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+
+
+class FakeOllama:
+    """
+    Local stand-in for an Ollama server, for benchmarks and offline runs.
+
+    Implements /, /api/tags, /api/ps, /api/pull, /api/generate and /api/chat
+    (streaming and not), /api/embeddings and /api/embed. Replies are
+    deterministic filler text and embeddings are hashed bags of words, so
+    similar texts get similar vectors.
+
+    Timing follows a simple cost model: loading a model that is not resident
+    takes load_delay, prompt tokens are evaluated at prefill_tps and reply
+    tokens are produced at decode_tps, with at most num_parallel generations
+    running at once (like OLLAMA_NUM_PARALLEL). keep_alive controls how long
+    a model stays resident. Tokens are estimated at four characters each.
+    Tokens passed back through 'context', and a chat prompt's prefix shared
+    with the previous chat request, count as cached and cost nothing.
+
+    Failures can be injected: failure_rate makes that fraction of generation
+    requests return HTTP 500, and crash_after makes the server die after that
+    many generation requests (the whole process when run from the CLI).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, model="llama3.2:latest", decode_tps=50.0,
+                 prefill_tps=1000.0, reply_tokens=40, num_parallel=1, load_delay=0.0,
+                 failure_rate=0.0, crash_after=None, embedding_dim=256, seed=0):
+        """
+        Args:
+            host (str): Interface to listen on.
+            port (int): Port to listen on, 0 picks a free one.
+            model (str): Name of the model the server reports (more can be pulled).
+            decode_tps (float): Reply tokens produced per second.
+            prefill_tps (float): Prompt tokens evaluated per second.
+            reply_tokens (int): Number of tokens in every reply (unless num_predict is lower).
+            num_parallel (int): Generations served concurrently; the rest wait.
+            load_delay (float): Seconds to load a model that is not resident.
+            failure_rate (float): Fraction of generation requests that fail with HTTP 500.
+            crash_after (int): Die after this many generation requests.
+            embedding_dim (int): Length of the embedding vectors.
+            seed (int): Seed for failure injection.
+        """
+        self.model = model
+        self.models = {model}
+        self.decode_tps = decode_tps
+        self.prefill_tps = prefill_tps
+        self.reply_tokens = reply_tokens
+        self.load_delay = load_delay
+        self.failure_rate = failure_rate
+        self.crash_after = crash_after
+        self.embedding_dim = embedding_dim
+        self.requests = 0  # Number of generation requests received
+        self.aborted = 0  # Streamed generations the client closed before the end
+        self.on_crash = self.stop  # What "dying" means; the CLI replaces this with a process exit
+        self._random = random.Random(seed)
+        self._resident = {}  # model -> monotonic time it expires (inf for forever)
+        self._last_chat_prompt = ""
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(num_parallel)
+        self._httpd = _Server((host, port), self._handler())
+        self._thread = None
+        self.logger = logging.getLogger('server')
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread. Returns the server's base URL."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.logger.info("Fake Ollama listening on %s", self.base_url)
+        return self.base_url
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @staticmethod
+    def count_tokens(text):
+        return max(1, (len(text) + 3) // 4) if text else 0
+
+    def resident_models(self):
+        now = time.monotonic()
+        with self._lock:
+            for model, expires in list(self._resident.items()):
+                if expires <= now:
+                    del self._resident[model]
+            return list(self._resident)
+
+    def _load(self, model, keep_alive):
+        """Make the model resident, paying load_delay if it was not. Returns the load time in ns."""
+        if model not in self.models:
+            raise KeyError(f"model '{model}' not found, try pulling it first")
+        seconds = parse_keep_alive(keep_alive)
+        loaded = model in self.resident_models()
+        if not loaded:
+            time.sleep(self.load_delay)
+        with self._lock:
+            if seconds == 0:
+                self._resident.pop(model, None)
+            else:
+                self._resident[model] = math.inf if seconds < 0 else time.monotonic() + seconds
+        return 0 if loaded else int(self.load_delay * 1e9)
+
+    def _count_request(self):
+        """Count a generation request and apply failure injection."""
+        with self._lock:
+            self.requests += 1
+            count = self.requests
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        if self.crash_after is not None and count > self.crash_after:
+            self.logger.warning("Fake Ollama crashing after %d requests", self.crash_after)
+            threading.Thread(target=self.on_crash, daemon=True).start()
+            raise InjectedFailure("server crashed")
+        if fail:
+            raise InjectedFailure("injected failure")
+
+    def _run(self, body, prompt_tokens, make_record):
+        """
+        Yield the records of one generation, sleeping to model its cost.
+
+        make_record(text, done) builds the endpoint-specific record.
+        """
+        started = time.perf_counter_ns()
+        self._count_request()
+        with self._slots:
+            load_duration = self._load(body.get("model", self.model), body.get("keep_alive"))
+            prefill = prompt_tokens / self.prefill_tps
+            time.sleep(prefill)
+            num_predict = (body.get("options") or {}).get("num_predict")
+            reply_tokens = self.reply_tokens if num_predict is None or num_predict < 0 \
+                else min(self.reply_tokens, num_predict)
+            if body.get("format"):
+                # Structured output: a JSON document, streamed four characters per token
+                text = json.dumps(fill_format(body["format"]))
+                pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+            else:
+                pieces = [f"word{i} " for i in range(reply_tokens)]
+            reply_tokens = len(pieces)
+            decode_started = time.perf_counter_ns()
+            for piece in pieces:
+                time.sleep(1 / self.decode_tps)
+                yield make_record(piece, False)
+            eval_duration = time.perf_counter_ns() - decode_started
+        final = make_record("", True)
+        final.update({
+            "total_duration": time.perf_counter_ns() - started,
+            "load_duration": load_duration,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": reply_tokens,
+            "eval_duration": eval_duration,
+        })
+        yield final
+
+    def generate(self, body):
+        """
+        Yield the NDJSON records of a /api/generate request.
+
+        The prompt cost only covers the new system/prompt text: tokens passed
+        back through 'context' are treated as already cached. A request without
+        a prompt only loads (or, with keep_alive 0, unloads) the model.
+        """
+        model = body.get("model", self.model)
+        if not body.get("prompt"):
+            load_duration = self._load(model, body.get("keep_alive"))
+            yield {"model": model, "response": "", "done": True, "load_duration": load_duration}
+            return
+        prompt_tokens = self.count_tokens(body.get("system", "")) + self.count_tokens(body["prompt"])
+        context = list(body.get("context") or [])
+
+        def make_record(text, done):
+            return {"model": model, "response": text, "done": done}
+
+        for record in self._run(body, prompt_tokens, make_record):
+            if record["done"]:
+                # The tokens actually generated, which num_predict may have capped
+                record["context"] = context + list(range(prompt_tokens + record["eval_count"]))
+            yield record
+
+    def chat(self, body):
+        """Yield the NDJSON records of a /api/chat request."""
+        model = body.get("model", self.model)
+        prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+        with self._lock:
+            shared = len(os.path.commonprefix([prompt, self._last_chat_prompt]))
+            self._last_chat_prompt = prompt
+        prompt_tokens = self.count_tokens(prompt[shared:])
+
+        def make_record(text, done):
+            return {"model": model, "message": {"role": "assistant", "content": text}, "done": done}
+
+        yield from self._run(body, prompt_tokens, make_record)
+
+    def embed(self, text):
+        """Deterministic unit vector: a hashed bag of the text's lower-cased words."""
+        vector = [0.0] * self.embedding_dim
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode()) % self.embedding_dim] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, obj, status=200):
+                body = json.dumps(obj).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path == "/":
+                    body = b"Ollama is running"
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path == "/api/tags":
+                    self._send_json({"models": [{"name": name, "size": 0, "digest": f"fake-{name}"}
+                                                for name in sorted(fake.models)]})
+                elif self.path == "/api/ps":
+                    self._send_json({"models": [{"name": name, "size": 0} for name in fake.resident_models()]})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                body = self._read_json()
+                if self.path == "/api/generate":
+                    self._send_generation(body, fake.generate(body), "response")
+                elif self.path == "/api/chat":
+                    self._send_generation(body, fake.chat(body), "message")
+                elif self.path == "/api/embeddings":
+                    self._send_json({"embedding": fake.embed(body.get("prompt", ""))})
+                elif self.path == "/api/embed":
+                    inputs = body.get("input", "")
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    self._send_json({"model": body.get("model", fake.model),
+                                     "embeddings": [fake.embed(text) for text in inputs]})
+                elif self.path == "/api/pull":
+                    fake.models.add(body.get("model") or body.get("name"))
+                    self._send_json({"status": "success"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _send_generation(self, body, records, field):
+                try:
+                    first = next(records)
+                except InjectedFailure as e:
+                    self._send_json({"error": str(e)}, 500)
+                    return
+                except KeyError as e:
+                    self._send_json({"error": e.args[0]}, 404)
+                    return
+                if not body.get("stream", True):
+                    collected = [first] + list(records)
+                    final = collected[-1]
+                    if field == "message":
+                        final["message"]["content"] = "".join(r["message"]["content"] for r in collected)
+                    else:
+                        final["response"] = "".join(r["response"] for r in collected)
+                    self._send_json(final)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    record = first
+                    while True:
+                        line = json.dumps(record).encode() + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                        self.wfile.flush()
+                        record = next(records, None)
+                        if record is None:
+                            break
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away; stop "generating" like Ollama does
+                    self.close_connection = True
+                    with fake._lock:
+                        fake.aborted += 1
+                finally:
+                    records.close()
+
+        return Handler
+
+
+def fill_format(schema, index=0):
+    """Deterministic value matching a request's "format" ("json" or a JSON schema)."""
+    if not isinstance(schema, dict):
+        return {}
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        value = {name: fill_format(sub, index + i)
+                 for i, (name, sub) in enumerate(schema.get("properties", {}).items())}
+        if isinstance(schema.get("additionalProperties"), dict):
+            value.update({f"key{index + i}": fill_format(schema["additionalProperties"], index + i)
+                          for i in range(2)})
+        return value
+    if kind == "array":
+        return [fill_format(schema.get("items", {}), index + i) for i in range(3)]
+    if kind == "integer":
+        return 10 + index
+    if kind == "number":
+        return 1.5 + index
+    if kind == "boolean":
+        return True
+    return f"word{index} word{index + 1}"
+
+
+def write_executable(directory, **settings):
+    """
+    Write a script that runs this module like the `ollama` executable.
+
+    Pass its path as OllamaService(ollama_path=...) to spawn, supervise and
+    restart fake servers exactly like real ones.
+
+    Args:
+        directory (str): Where to write the script.
+        **settings: Cost model settings, e.g. decode_tps=200 or crash_after=5.
+    """
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+    flags = " ".join(f"--{name.replace('_', '-')} {value}" for name, value in settings.items())
+    if os.name == "nt":
+        path = os.path.join(directory, "fake-ollama.bat")
+        script = (f'@echo off\r\nset PYTHONPATH={root}\r\n'
+                  f'"{sys.executable}" -m python.main.OllamaServerServices.fake_ollama %* {flags}\r\n')
+    else:
+        path = os.path.join(directory, "fake-ollama")
+        script = (f'#!/bin/sh\nPYTHONPATH="{root}" exec "{sys.executable}" '
+                  f'-m python.main.OllamaServerServices.fake_ollama "$@" {flags}\n')
+    with open(path, "w") as f:
+        f.write(script)
+    os.chmod(path, 0o755)
+    return path
+
+
+def main():
+    """
+    Run the fake as a stand-in `ollama` executable.
+
+    Supports `--version` and `serve`, binds OLLAMA_HOST like Ollama does and
+    prints "Listening on ..." so OllamaService can supervise it.
+    """
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks.")
+    parser.add_argument("--version", action="store_true")
+    parser.add_argument("command", nargs="?", default="serve", choices=["serve"])
+    parser.add_argument("--decode-tps", type=float, default=float(os.environ.get("FAKE_OLLAMA_DECODE_TPS", 50)))
+    parser.add_argument("--prefill-tps", type=float, default=float(os.environ.get("FAKE_OLLAMA_PREFILL_TPS", 1000)))
+    parser.add_argument("--reply-tokens", type=int, default=int(os.environ.get("FAKE_OLLAMA_REPLY_TOKENS", 40)))
+    parser.add_argument("--load-delay", type=float, default=float(os.environ.get("FAKE_OLLAMA_LOAD_DELAY", 0)))
+    parser.add_argument("--failure-rate", type=float, default=float(os.environ.get("FAKE_OLLAMA_FAILURE_RATE", 0)))
+    parser.add_argument("--crash-after", type=int, default=os.environ.get("FAKE_OLLAMA_CRASH_AFTER"))
+    parser.add_argument("--num-parallel", type=int, default=int(os.environ.get("OLLAMA_NUM_PARALLEL", 1)))
+    args = parser.parse_args()
+
+    if args.version:
+        print("ollama version is 0.0.0-fake")
+        return
+
+    host, _, port = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434").rpartition(":")
+    fake = FakeOllama(host=host or "127.0.0.1", port=int(port), decode_tps=args.decode_tps,
+                      prefill_tps=args.prefill_tps, reply_tokens=args.reply_tokens,
+                      num_parallel=args.num_parallel, load_delay=args.load_delay,
+                      failure_rate=args.failure_rate,
+                      crash_after=int(args.crash_after) if args.crash_after is not None else None)
+    fake.on_crash = lambda: os._exit(1)
+    print(f"Listening on {host}:{port} (version 0.0.0-fake)", file=sys.stderr, flush=True)
+    fake._httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
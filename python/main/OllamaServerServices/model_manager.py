@@ -0,0 +1,148 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from python.main.utils.logging_config import logging
+from python.main.OllamaServerServices.ollama_client import DEFAULT_BASE_URL, get_client
+from python.main.utils.lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+
+class ModelManager:
+    """
+    Manage which models the Ollama server keeps loaded.
+
+    Models are pulled when missing, preloaded in the background so the first
+    turn does not pay the load time, and evicted least-recently-used first
+    when a new model would exceed the residency limits.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, keep_alive="30m", max_resident=1, memory_budget=None, client=None):
+        """
+        Args:
+            base_url (str): Root URL of the Ollama server.
+            keep_alive (str | int): How long loaded models stay resident.
+            max_resident (int): Maximum number of models kept loaded at once.
+            memory_budget (int): Optional cap in bytes on the approximate memory of loaded models.
+            client (OllamaClient): Client to use, the shared one for base_url by default.
+        """
+        self.client = client or get_client(base_url)
+        self.keep_alive = keep_alive
+        self.max_resident = max_resident
+        self.memory_budget = memory_budget
+        self.resident = OrderedDict()  # model name -> approximate size in bytes, least recently used first
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-preload")
+        self.logger = logging.getLogger('server')
+
+    def list_models(self):
+        """Return the locally available models, keyed by name."""
+        return {model["name"]: model for model in self.client.tags().get("models", [])}
+
+    def ensure_available(self, model):
+        """Pull the model if the server does not have it yet. Returns its /api/tags entry."""
+        models = self.list_models()
+        if model not in models:
+            self.pull(model)
+            models = self.list_models()
+        return models.get(model, {})
+
+    def pull(self, model):
+        """Download a model to the server (blocks until the pull is complete)."""
+        self.logger.info("Model %s not found locally, pulling it...", model)
+        response = self.client.post("/api/pull", json={"model": model, "stream": False},
+                                    timeout=(self.client.timeout[0], None))
+        response.raise_for_status()
+        self.logger.info("Pulled model %s", model)
+
+    def preload(self, model, options=None):
+        """
+        Make sure the model is available and loaded, evicting others if needed.
+
+        Args:
+            model (str): Model to load.
+            options (dict): The generation options requests will use. Ollama reloads the model
+                when num_ctx (and other load-time options) differ, so pass the same ones.
+        """
+        info = self.ensure_available(model)
+        with self._lock:
+            if model in self.resident:
+                self.resident.move_to_end(model)
+                return
+            self._make_room(model, info.get("size", 0))
+        self.logger.info("Preloading model %s", model)
+        # A generate request without a prompt only loads the model
+        payload = {"model": model, "keep_alive": self.keep_alive}
+        if options:
+            payload["options"] = options
+        self.client.generate(payload, timeout=(self.client.timeout[0], None))
+        with self._lock:
+            self.resident[model] = info.get("size", 0)
+        self.refresh()
+        self.logger.info("Model %s is resident", model)
+
+    def preload_async(self, model, options=None):
+        """Preload the model in the background. Returns a Future that completes when it is loaded."""
+        return self._executor.submit(self.preload, model, options)
+
+    def use(self, model, options=None):
+        """Mark the model as used now, loading it first (with options, see preload) if it is not resident."""
+        with self._lock:
+            if model in self.resident:
+                self.resident.move_to_end(model)
+                return
+        self.preload(model, options)
+
+    def touch(self, model):
+        """Record that the model was just used, without loading it."""
+        with self._lock:
+            if model in self.resident:
+                self.resident.move_to_end(model)
+
+    def unload(self, model):
+        """Ask the server to release the model's memory now."""
+        self.logger.info("Unloading model %s", model)
+        self.client.generate({"model": model, "keep_alive": 0})
+        with self._lock:
+            self.resident.pop(model, None)
+
+    def refresh(self):
+        """Update the resident models and their memory use from /api/ps."""
+        try:
+            response = self.client.get("/api/ps", retries=0)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            self.logger.debug("Could not list running models: %s", str(e))
+            return
+        running = {model["name"]: model.get("size", 0) for model in response.json().get("models", [])}
+        with self._lock:
+            for name in list(self.resident):
+                if name not in running:
+                    # Expired on the server (keep_alive ran out)
+                    del self.resident[name]
+            for name, size in running.items():
+                known = name in self.resident
+                self.resident[name] = size
+                if not known:
+                    # Loaded by someone else; treat it as the first candidate for eviction
+                    self.resident.move_to_end(name, last=False)
+
+    def resident_memory(self):
+        """Approximate bytes used by the resident models."""
+        with self._lock:
+            return sum(self.resident.values())
+
+    def _make_room(self, model, size):
+        """Evict least recently used models until the new one fits the limits."""
+        while self.resident:
+            too_many = len(self.resident) >= self.max_resident
+            too_big = self.memory_budget is not None and self.resident_memory() + size > self.memory_budget
+            if not (too_many or too_big):
+                break
+            victim = next(iter(self.resident))
+            self.logger.info("Evicting least recently used model %s to make room for %s", victim, model)
+            self.unload(victim)
+
+    def close(self):
+        """Stop the background preload worker."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,211 @@
+import threading
+import time
+from python.main.utils.logging_config import logging
+from python.main.utils.ndjson import iter_ndjson
+from python.main.utils.lazy_import import lazy_import
+
+# Loaded by the first client, so commands that only print help never import it
+requests = lazy_import("requests")
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+class OllamaClient:
+    """
+    HTTP client for the Ollama API built on one pooled keep-alive session.
+
+    Connection failures are retried with exponential backoff. Nothing else is
+    retried here: once the server has accepted a request, whether to try again
+    is up to the caller.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, connect_timeout=5, read_timeout=30,
+                 retries=3, backoff=0.5, pool_size=16):
+        """
+        Args:
+            base_url (str): Root URL of the Ollama server.
+            connect_timeout (float): Seconds allowed to establish a connection.
+            read_timeout (float): Seconds allowed between bytes of a response.
+            retries (int): Extra attempts after a connection failure.
+            backoff (float): Delay before the first retry, doubled for each further one.
+            pool_size (int): Number of keep-alive connections kept open to the server.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        self._local = threading.local()  # Per-thread retry count, so turns can report their own retries
+        self.logger = logging.getLogger('client')
+
+    def thread_retries(self):
+        """Number of retries made so far by requests from the calling thread."""
+        return getattr(self._local, "retries", 0)
+
+    def request(self, method, path, retries=None, **kwargs):
+        """
+        Send a request, retrying connection failures with backoff.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path below the base URL, e.g. "/api/tags".
+            retries (int): Overrides the client's retry count for this call.
+            **kwargs: Passed to requests.Session.request (json, stream, timeout...).
+        """
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault("timeout", self.timeout)
+        delay = self.backoff
+        for attempt in range(retries + 1):
+            try:
+                return self.session.request(method, self.base_url + path, **kwargs)
+            except requests.exceptions.ConnectionError:
+                if attempt == retries:
+                    if retries:
+                        self.logger.error("Connection to %s failed after %d attempts", self.base_url, attempt + 1)
+                    raise
+                self.logger.warning("Connection error on attempt %d, retrying in %.1f seconds...", attempt + 1, delay)
+                self._local.retries = self.thread_retries() + 1
+                time.sleep(delay)
+                delay *= 2
+
+    def get(self, path, **kwargs):
+        """Send a GET request."""
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, json=None, **kwargs):
+        """Send a POST request with a JSON body."""
+        return self.request("POST", path, json=json, **kwargs)
+
+    def is_healthy(self, timeout=(0.5, 2)):
+        """Check whether an Ollama server answers, without retrying."""
+        try:
+            response = self.get("/", retries=0, timeout=timeout)
+            return response.status_code == 200 and "Ollama" in response.text
+        except requests.exceptions.RequestException:
+            return False
+
+    def tags(self):
+        """Return the /api/tags listing of local models."""
+        response = self.get("/api/tags")
+        response.raise_for_status()
+        return response.json()
+
+    def generate(self, payload, **kwargs):
+        """Run a non-streaming /api/generate request and return the decoded reply."""
+        response = self.post("/api/generate", json=dict(payload, stream=False), **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def stream(self, path, payload, **kwargs):
+        """
+        Post a streaming request and yield the NDJSON records of the reply.
+
+        The connection goes back to the pool when the generator is exhausted or
+        closed; closing it early also stops the server from generating further.
+        """
+        with self.post(path, json=dict(payload, stream=True), stream=True, **kwargs) as response:
+            response.raise_for_status()
+            for record in iter_ndjson(response.iter_content(chunk_size=None)):
+                if "error" in record:
+                    raise RuntimeError(record["error"])
+                yield record
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+async def _to_thread(func, *args, **kwargs):
+    import asyncio  # Only async callers pay for importing it
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of OllamaClient with the same methods as coroutines.
+
+    Requests run on the default executor through a shared OllamaClient, so
+    they still benefit from its connection pool and retry policy.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, client=None, **kwargs):
+        """
+        Args:
+            base_url (str): Root URL of the Ollama server.
+            client (OllamaClient): Synchronous client to wrap; one is created from kwargs by default.
+        """
+        self.client = client or OllamaClient(base_url, **kwargs)
+        self.base_url = self.client.base_url
+
+    async def request(self, method, path, **kwargs):
+        return await _to_thread(self.client.request, method, path, **kwargs)
+
+    async def get(self, path, **kwargs):
+        return await _to_thread(self.client.get, path, **kwargs)
+
+    async def post(self, path, json=None, **kwargs):
+        return await _to_thread(self.client.post, path, json, **kwargs)
+
+    async def is_healthy(self, timeout=(0.5, 2)):
+        return await _to_thread(self.client.is_healthy, timeout)
+
+    async def tags(self):
+        return await _to_thread(self.client.tags)
+
+    async def generate(self, payload, **kwargs):
+        return await _to_thread(self.client.generate, payload, **kwargs)
+
+    async def stream(self, path, payload, **kwargs):
+        """Async generator over the NDJSON records of a streaming request."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def pump():
+            records = self.client.stream(path, payload, **kwargs)
+            try:
+                for record in records:
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, record)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                records.close()
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        worker = loop.run_in_executor(None, pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            await worker
+
+    async def close(self):
+        self.client.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url=DEFAULT_BASE_URL):
+    """Return the shared OllamaClient for a server, creating it on first use."""
+    base_url = base_url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = OllamaClient(base_url)
+        return client
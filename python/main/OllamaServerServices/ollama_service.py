@@ -1,55 +1,90 @@
+import os
 import subprocess
 import time
 import signal
 import sys
 import threading
-from python.main.utils.logging_config import logging  # Adjust based on your logging configuration
+from python.main.utils.logging_config import logging, init_logging  # Adjust based on your logging configuration
+from python.main.OllamaServerServices.ollama_client import DEFAULT_BASE_URL, get_client
+from python.main.OllamaServerServices.circuit_breaker import CircuitBreaker
+from python.main.utils import metrics
 
 class OllamaService:
-    def __init__(self, ollama_path="ollama"):
+    def __init__(self, ollama_path="ollama", host="localhost", port=11434):
         """
         Initialize OllamaService with path to ollama executable.
 
         Args:
             ollama_path (str): Path to ollama executable, defaults to "ollama".
+            host (str): Host the server is reached on, defaults to "localhost".
+            port (int): Port the server listens on, defaults to 11434.
         """
         self.ollama_path = ollama_path
+        self.host = host
+        self.port = port
+        self.base_url = f"http://{host}:{port}"
+        self.client = get_client(self.base_url)
         self.process = None
+        self.attached = False  # True when using a server that was already running
         self.logger = logging.getLogger('server')  # Use the server logger
+        # Raw `ollama serve` output, rate limited by the logging configuration
+        self.output_logger = logging.getLogger('server.output')
+        # Set when the server output says it is listening, or when the output ends
+        self._output_signal = threading.Event()
+        self.breaker = CircuitBreaker()  # Opened by the supervisor while the server is down
+        self.recovery_times = []  # Seconds from detecting an outage to serving again, per outage
+        self._supervisor = None
+        self._supervisor_stop = threading.Event()
+        # Held while the process is spawned or torn down, so stop() and a restart cannot interleave
+        self._process_lock = threading.Lock()
 
-    def start(self):
-        """Start the Ollama server process."""
+    def start(self, wait_ready=True, timeout=30, stop=None):
+        """
+        Start the Ollama server process.
+
+        Args:
+            wait_ready (bool): Block until the server answers HTTP requests.
+            timeout (float): Seconds to wait for the server to become ready.
+            stop (threading.Event): Give up, without spawning or waiting any further, once this is set.
+        """
         try:
             self.logger.info("Starting Ollama server from: %s", self.ollama_path)
 
+            # Check if port is already in use
+            if self._check_port_in_use(self.port):
+                if self.is_ready():
+                    # Attaching is much cheaper than spawning a second server
+                    self.logger.info("Ollama is already serving on port %d, attaching to it", self.port)
+                    self.attached = True
+                    return
+                raise RuntimeError(f"Port {self.port} is already in use by something other than Ollama.")
+
             # First check if ollama exists
             if not self._check_ollama_exists():
                 raise FileNotFoundError(f"Ollama executable not found at: {self.ollama_path}")
 
-            # Check if port is already in use
-            if self._check_port_in_use(11434):
-                raise RuntimeError("Port 11434 is already in use. Is Ollama already running?")
-
             # Start ollama serve process with full output capture
-            self.process = subprocess.Popen(
-                [self.ollama_path, "serve"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,  # Line buffered
-                universal_newlines=True
-            )
+            # OLLAMA_HOST tells the server which address and port to bind
+            env = dict(os.environ, OLLAMA_HOST=f"{self.host}:{self.port}")
+            with self._process_lock:
+                if stop is not None and stop.is_set():
+                    raise RuntimeError("Stopped before the Ollama server was started.")
+                self.process = subprocess.Popen(
+                    [self.ollama_path, "serve"],
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    bufsize=1,  # Line buffered
+                    universal_newlines=True
+                )
 
             # Read stdout and stderr in a separate thread
             threading.Thread(target=self._read_output, args=(self.process.stdout,), daemon=True).start()
             threading.Thread(target=self._read_output, args=(self.process.stderr,), daemon=True).start()
 
-            # Wait a bit for the server to start
-            time.sleep(5)
-
-            # Check if process is still running
-            if self.process.poll() is not None:
-                raise RuntimeError("Ollama server process terminated unexpectedly.")
+            if wait_ready:
+                self.wait_until_ready(timeout, stop)
 
             self.logger.info("Ollama server process initialized")
 
@@ -57,6 +92,43 @@ class OllamaService:
             self.logger.error("Error starting Ollama server: %s", str(e))
             raise
 
+    def wait_until_ready(self, timeout=30, stop=None):
+        """
+        Block until the server can serve requests.
+
+        Wakes up as soon as the server logs that it is listening (or its output
+        ends), and otherwise probes HTTP with a short, growing backoff.
+
+        Args:
+            timeout (float): Seconds to wait.
+            stop (threading.Event): Stop waiting once this is set.
+
+        Raises:
+            RuntimeError: If the process exits, stop is set or the timeout expires first.
+        """
+        started = time.perf_counter()
+        deadline = started + timeout
+        delay = 0.05
+        while True:
+            if stop is not None and stop.is_set():
+                raise RuntimeError("Stopped while waiting for the Ollama server.")
+            if self.process and self.process.poll() is not None:
+                raise RuntimeError(
+                    f"Ollama server process terminated unexpectedly (exit code {self.process.returncode}).")
+            if self.is_ready():
+                self.logger.info("Ollama server ready after %.2fs", time.perf_counter() - started)
+                return
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise RuntimeError(f"Ollama server did not become ready within {timeout}s.")
+            self._output_signal.wait(min(delay, remaining))
+            self._output_signal.clear()
+            delay = min(delay * 2, 0.5)
+
+    def is_ready(self):
+        """Check whether an Ollama server answers on the configured port."""
+        return self.client.is_healthy()
+
     def _check_ollama_exists(self):
         """Check if ollama executable exists."""
         try:
@@ -74,8 +146,98 @@ class OllamaService:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
             return s.connect_ex(('localhost', port)) == 0
 
+    def supervise(self, interval=2.0, failures_before_restart=3, max_backoff=60.0):
+        """
+        Watch the server in a background thread and restart it when it dies.
+
+        The process is checked with poll() and an HTTP probe every interval
+        seconds. A crash, or failures_before_restart failed probes in a row,
+        opens the circuit breaker and restarts the server with exponential
+        backoff; the breaker closes again once the server is ready.
+
+        Args:
+            interval (float): Seconds between checks.
+            failures_before_restart (int): Failed probes that count as an outage.
+            max_backoff (float): Upper bound for the delay between restart attempts.
+        """
+        if self._supervisor and self._supervisor.is_alive():
+            return
+        self._supervisor_stop.clear()
+        self._supervisor = threading.Thread(
+            target=self._supervise, args=(interval, failures_before_restart, max_backoff),
+            name="ollama-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _supervise(self, interval, failures_before_restart, max_backoff):
+        failed_probes = 0
+        while not self._supervisor_stop.wait(interval):
+            crashed = self.process is not None and self.process.poll() is not None
+            if not crashed:
+                if self.is_ready():
+                    failed_probes = 0
+                    self.breaker.record_success()
+                    continue
+                failed_probes += 1
+                if failed_probes < failures_before_restart:
+                    continue
+
+            down_since = time.perf_counter()
+            if crashed:
+                reason = f"Ollama server exited with code {self.process.returncode}"
+            else:
+                reason = f"Ollama server failed {failed_probes} health checks in a row"
+            self.logger.error(reason)
+            self.breaker.trip(reason)
+            if self._restart(max_backoff):
+                recovery = time.perf_counter() - down_since
+                self.recovery_times.append(recovery)
+                metrics.REGISTRY.observe("ollama_recovery_seconds", recovery, "Time from outage to serving again")
+                self.logger.info("Ollama server recovered in %.2fs", recovery)
+                self.breaker.record_success()
+            failed_probes = 0
+
+    def _restart(self, max_backoff):
+        """Restart the server until it is ready or supervision stops. Returns True on success."""
+        backoff = 1.0
+        while not self._supervisor_stop.is_set():
+            try:
+                if self.attached:
+                    # Not our process: all we can do is wait for it to come back
+                    self.wait_until_ready(timeout=backoff, stop=self._supervisor_stop)
+                else:
+                    self._terminate()
+                    self.start(stop=self._supervisor_stop)
+                    if self._supervisor_stop.is_set():
+                        break
+                return True
+            except Exception as e:
+                if self._supervisor_stop.is_set():
+                    break
+                self.logger.warning("Restart failed (%s), retrying in %.0fs", str(e), backoff)
+                if self._supervisor_stop.wait(backoff):
+                    break
+                backoff = min(backoff * 2, max_backoff)
+        # stop() was called mid-restart; don't leave a newly started process behind
+        self._terminate()
+        return False
+
     def stop(self):
+        """Stop supervision and the Ollama server process."""
+        self._supervisor_stop.set()
+        if self._supervisor and self._supervisor is not threading.current_thread():
+            self._supervisor.join(timeout=5)
+        self._terminate()
+
+    def _terminate(self):
         """Stop the Ollama server process."""
+        with self._process_lock:
+            self._terminate_process()
+
+    def _terminate_process(self):
+        if self.attached:
+            # The server was not started by us, leave it running
+            self.attached = False
+            return
         if self.process:
             self.logger.info("Stopping Ollama server...")
             self.process.terminate()  # Send SIGTERM signal
@@ -102,8 +264,12 @@ class OllamaService:
     def _read_output(self, stream):
         """Read output from a given stream (stdout or stderr)."""
         for line in iter(stream.readline, ''):
-            self.logger.info(line.strip())
+            self.output_logger.info(line.strip())
+            if "Listening on" in line:
+                self._output_signal.set()
         stream.close()
+        # The process closed its output, most likely because it exited
+        self._output_signal.set()
 
     def __enter__(self):
         """Context manager entry."""
@@ -125,6 +291,7 @@ if __name__ == "__main__":
         sys.exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
+    init_logging()
 
     # Start server
     server = OllamaService()
@@ -138,18 +305,6 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error: {e}")
 
-def check_server_health():
+def check_server_health(base_url=DEFAULT_BASE_URL):
     """Check if server is responsive."""
-    try:
-        response = requests.get('http://localhost:11434/api/tags')
-        return response.status_code == 200
-    except:
-        return False
-
-def ensure_server_running(self):
-    """Ensure the server is running, restarting if necessary."""
-    if not self.check_server_health():
-        self.logger.warning("Ollama server unresponsive, attempting to restart...")
-        self.stop()
-        time.sleep(5)  # Wait before trying to start again
-        self.start()
+    return get_client(base_url).is_healthy()
@@ -0,0 +1,58 @@
+"""
+AI Adventure command line.
+
+    python -m python.main play [--model NAME] [--port PORT]
+    python -m python.main serve --max-in-flight 4
+    python -m python.main healthcheck
+    python -m python.main bench --only latency
+    python -m python.main prewarm --combo horror survival "abandoned asylum"
+    python -m python.main <command> --help
+
+Only the chosen command's module is imported, so `--help` and typos answer
+at once and no command pays for another's dependencies.
+"""
+import time
+
+launched_at = time.perf_counter()  # Start of the program, for the cold-start time `play` reports
+
+import importlib
+import sys
+
+# command -> (module with a main(), summary)
+COMMANDS = {
+    "play": ("python.main.GameFolder.AIAdventureGame", "Play in the terminal, starting or attaching to Ollama"),
+    "serve": ("python.main.GameFolder.game_server", "Serve many sessions over HTTP"),
+    "healthcheck": ("python.main.OllamaServerServices.OllamaServerHealthCheck",
+                    "Start or attach to Ollama and check that it answers"),
+    "bench": ("python.bench.run_benchmarks", "Run the benchmark suite against a fake Ollama"),
+    "prewarm": ("python.main.GameFolder.prewarm", "Generate and cache opening scenes"),
+    "batch": ("python.main.GameFolder.batch_play", "Replay scripted sessions headlessly"),
+    "tune": ("python.main.GameFolder.options_controller", "Sweep generation settings and save the best profile"),
+}
+
+
+def usage():
+    lines = ["usage: python -m python.main <command> [options]", "", "commands:"]
+    lines += [f"  {name:<12} {summary}" for name, (_, summary) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0 if argv else 2
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"unknown command: {command}\n\n{usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[command][0])
+    # The command parses its own options, and its usage names the command
+    sys.argv = [f"python -m python.main {command}"] + rest
+    if command == "play":
+        return module.main(launched_at=launched_at)
+    return module.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
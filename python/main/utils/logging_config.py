@@ -1,21 +1,149 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 
-# Create logs directory if it doesn't exist
+# Where log files go; nothing is created until init_logging() is called
 log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
-os.makedirs(log_dir, exist_ok=True)
-
-# Configure logging for the game
-logging.basicConfig(
-    filename=os.path.join(log_dir, 'game.log'),
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-# Configure logging for the server
-server_logger = logging.getLogger('server')
-server_handler = logging.FileHandler(os.path.join(log_dir, 'server.log'))
-server_handler.setLevel(logging.DEBUG)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-server_handler.setFormatter(formatter)
-server_logger.addHandler(server_handler)
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Per-logger levels applied by init_logging, on top of the root level
+DEFAULT_LEVELS = {
+    'server.output': logging.INFO,  # Lines printed by `ollama serve`
+    'client': logging.INFO,
+    'urllib3': logging.WARNING,  # One DEBUG line per HTTP request otherwise
+}
+
+_listener = None
+_queue_handler = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token-bucket filter: lets through `rate` records per second with bursts of `burst`.
+
+    The first record let through after some were suppressed says how many were skipped.
+    """
+
+    def __init__(self, rate=20.0, burst=50):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.suppressed = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+        if suppressed:
+            record.msg = f"[{suppressed} lines suppressed] {record.msg}"
+        return True
+
+
+def init_logging(directory=None, level=logging.INFO, levels=None, max_bytes=10 * 1024 * 1024,
+                 backup_count=3, queue_size=10000, server_output_rate=20.0):
+    """
+    Configure logging for the application. Safe to call more than once.
+
+    Records are put on a bounded queue and written by a background listener,
+    so callers never wait on file I/O; if the queue is full, records are
+    dropped rather than stalling a turn. Everything goes to game.log, the
+    'server' loggers also to server.log, both rotated by size.
+
+    Args:
+        directory (str): Log directory, defaults to python/main/logs.
+        level (int): Root logger level.
+        levels (dict): Per-logger levels, applied after DEFAULT_LEVELS.
+        max_bytes (int): Size at which a log file is rotated.
+        backup_count (int): Rotated files kept per log.
+        queue_size (int): Records buffered before new ones are dropped.
+        server_output_rate (float): Lines per second of `ollama serve` output that are logged.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+    # Registered here rather than on import; unregistering first keeps it to one call
+    atexit.unregister(shutdown_logging)
+    atexit.register(shutdown_logging)
+
+    directory = directory or log_dir
+    os.makedirs(directory, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    game_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(directory, 'game.log'), maxBytes=max_bytes, backupCount=backup_count)
+    game_handler.setFormatter(formatter)
+    server_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(directory, 'server.log'), maxBytes=max_bytes, backupCount=backup_count)
+    server_handler.setFormatter(formatter)
+    server_handler.addFilter(logging.Filter('server'))
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, game_handler, server_handler,
+                                               respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    for name, logger_level in DEFAULT_LEVELS.items():
+        # Defaults only make these loggers quieter than the root, never louder
+        logging.getLogger(name).setLevel(max(logger_level, level))
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    output_logger = logging.getLogger('server.output')
+    for old in [f for f in output_logger.filters if isinstance(f, RateLimitFilter)]:
+        output_logger.removeFilter(old)
+    if server_output_rate:
+        output_logger.addFilter(RateLimitFilter(server_output_rate, burst=max(1, int(server_output_rate * 5))))
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and detach the logging pipeline."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+    if _listener is not None:
+        while True:
+            try:
+                _listener.stop()  # Processes everything still queued
+                break
+            except queue.Full:
+                # No room for the stop sentinel yet; the listener is still draining
+                time.sleep(0.01)
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        if _queue_handler.dropped:
+            logging.getLogger('game').warning("%d log records were dropped", _queue_handler.dropped)
+        _queue_handler = None
+
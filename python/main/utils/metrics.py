@@ -0,0 +1,205 @@
+import json
+import math
+import threading
+from collections import deque
+from python.main.utils.logging_config import logging
+
+# Seconds, from a fast cached prefill up to a slow cold load
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Token and character counts
+SIZE_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+
+class Histogram:
+    """
+    Cumulative Prometheus-style histogram plus a rolling window for quantiles.
+
+    The buckets count every observation since start; the window keeps the
+    last `window` values so p50/p95 reflect recent turns.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def quantile(self, q):
+        """Quantile of the recent window (nearest rank), or None without data."""
+        with self._lock:
+            values = sorted(self.recent)
+        if not values:
+            return None
+        return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """
+    Holds the histograms and counters for one process.
+
+    Metrics are identified by name and an optional label dict (e.g. the model),
+    and can be exported as Prometheus text or as JSON.
+    """
+
+    def __init__(self):
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> float
+        self._help = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+        self.logger = logging.getLogger('game')
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, labels=None):
+        """Return the histogram for name and labels, creating it on first use."""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+                self._help.setdefault(name, help)
+            return histogram
+
+    def observe(self, name, value, help="", buckets=DEFAULT_BUCKETS, labels=None):
+        if value is not None:
+            self.histogram(name, help, buckets, labels).observe(value)
+
+    def inc(self, name, amount=1, help="", labels=None):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._help.setdefault(name, help)
+
+    def record_turn(self, stats, model=None):
+        """
+        Record one turn's stats (as built by AIAdventureGame._record_turn_stats).
+
+        Ollama reports durations in nanoseconds; they are stored in seconds so
+        load, prefill and decode time can be compared with client wall time.
+        """
+        labels = {"model": model} if model else None
+        self.inc("turns_total", help="Turns generated", labels=labels)
+        self.inc("turn_retries_total", stats.get("retries", 0), help="Connection retries during turns", labels=labels)
+        self.observe("turn_wall_seconds", stats.get("wall_time"), "Client-side turn time", labels=labels)
+        self.observe("turn_ttft_seconds", stats.get("ttft"), "Time to first token", labels=labels)
+        for field in ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration"):
+            value = stats.get(field)
+            if value is not None:
+                self.observe(f"ollama_{field}_seconds", value / 1e9, f"Ollama-reported {field}", labels=labels)
+        for field in ("prompt_eval_count", "eval_count", "prompt_chars", "prompt_tokens"):
+            self.observe(f"turn_{field}", stats.get(field), f"Per-turn {field}", SIZE_BUCKETS, labels)
+        self.observe("turn_tokens_per_second", stats.get("tokens_per_s"), "Decode rate",
+                     (1, 2, 5, 10, 20, 40, 80, 160, 320), labels)
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {self._help.get(name, '')}", f"# TYPE {name} counter"]
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {self._help.get(name, '')}", f"# TYPE {name} histogram"]
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Counters and histogram summaries as plain data."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in counters],
+            "histograms": [dict(histogram.snapshot(), name=name, labels=dict(labels))
+                           for (name, labels), histogram in histograms],
+        }
+
+    def dump_json(self, path):
+        """Write to_dict() to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        self.logger.info("Metrics written to %s", path)
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Expose /metrics (Prometheus text) and /metrics.json over HTTP in a background thread."""
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.to_dict()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="metrics-http", daemon=True).start()
+        self.logger.info("Metrics available on http://%s:%d/metrics", host, self._httpd.server_address[1])
+        return self._httpd.server_address[1]
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+def _labels(labels, **extra):
+    items = list(labels) + [(key, value) for key, value in extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+# Process-wide registry used by the game, the client and the server supervisor
+REGISTRY = MetricsRegistry()
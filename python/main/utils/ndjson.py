@@ -0,0 +1,42 @@
+import json
+
+
+class NDJSONParser:
+    """
+    Incremental parser for newline-delimited JSON (the format Ollama streams).
+
+    Network chunks do not line up with records: a chunk can hold several
+    records, or end in the middle of one. Bytes are buffered until a full
+    line is available, so records are only decoded once they are complete.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, chunk):
+        """
+        Add a chunk of bytes and return the list of records completed by it.
+
+        Args:
+            chunk (bytes | str): Raw data read from the stream.
+        """
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def close(self):
+        """Flush a trailing record that was not terminated by a newline."""
+        remainder, self._buffer = self._buffer, b""
+        if remainder.strip():
+            return [json.loads(remainder)]
+        return []
+
+
+def iter_ndjson(chunks):
+    """Yield decoded records from an iterable of byte chunks."""
+    parser = NDJSONParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
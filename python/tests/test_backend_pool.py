@@ -0,0 +1,63 @@
+import pytest
+import requests
+from python.main.OllamaServerServices.backend_pool import BackendPool, NoHealthyBackend
+from python.main.OllamaServerServices.fake_ollama import FakeOllama
+
+
+@pytest.fixture
+def fakes():
+    with FakeOllama() as first, FakeOllama() as second:
+        yield first, second
+
+
+@pytest.fixture
+def pool(fakes):
+    pool = BackendPool()
+    for fake in fakes:
+        pool.register(fake.base_url)
+    yield pool
+    pool.stop()
+
+
+def test_sessions_stay_on_their_backend(pool):
+    first, second = pool.backends
+    with pool.lease("a") as backend:
+        assert backend is first
+        # A new session goes to the idle backend
+        with pool.lease("b") as other:
+            assert other is second
+    # "a" comes back to its own backend even while it is the busier one
+    with pool.lease("c"):
+        with pool.lease("a") as backend:
+            assert backend is first
+    assert (first.sessions, second.sessions) == (2, 1)
+    assert first.in_flight == second.in_flight == 0
+    pool.forget("c")
+    assert first.sessions == 1
+
+
+def test_failed_request_ejects_and_health_check_readmits(pool):
+    first, second = pool.backends
+    with pytest.raises(requests.exceptions.ConnectionError):
+        with pool.lease("a") as backend:
+            assert backend is first
+            raise requests.exceptions.ConnectionError("reset by peer")
+    assert not first.healthy
+    # The session moves to a backend that can serve it
+    with pool.lease("a") as backend:
+        assert backend is second
+    assert (first.sessions, second.sessions) == (0, 1)
+    # The server behind the first backend is up, so the next check lets it back in
+    pool.check_health()
+    assert first.healthy
+    with pool.lease("b") as backend:
+        assert backend is first
+
+
+def test_health_check_ejects_dead_backend(pool, fakes):
+    fakes[0].stop()
+    pool.check_health()
+    assert [backend.healthy for backend in pool.backends] == [False, True]
+    pool.release(pool.acquire("a"), failed=True)
+    with pytest.raises(NoHealthyBackend):
+        pool.acquire("a")
@@ -0,0 +1,9 @@
+from python.main.GameFolder.context_window import TokenCounter
+
+
+def test_estimate_leaves_the_cache_alone():
+    counter = TokenCounter(max_entries=2)
+    assert counter.count("the hall") == counter.estimate("the hall") == 2
+    for i in range(10):
+        counter.estimate(f"a whole prompt seen once {i}")
+    assert list(counter._cache) == ["the hall"]
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import pytest
+from python.main.GameFolder.game_server import FairScheduler, GameServer, SchedulerFull, SessionBusy, read_events
+from python.main.GenerationBackends.stub_backend import StubBackend
+
+
+def recording_job(order, name, release=None):
+    """A job that records when it starts and then waits for release, if given."""
+    async def job():
+        order.append(name)
+        if release is not None:
+            await release.wait()
+        return name
+    return job
+
+
+def test_sessions_take_turns():
+    async def run():
+        scheduler = FairScheduler(max_in_flight=1, max_per_session=3)
+        order = []
+        futures = [scheduler.submit(session, recording_job(order, f"{session}{i}"))
+                   for session in "ab" for i in range(3)]
+        futures.append(scheduler.submit("c", recording_job(order, "c0")))
+        await asyncio.gather(*futures)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    # "a" submitted three jobs first, but the others do not wait behind all of them
+    assert order == ["a0", "b0", "c0", "a1", "b1", "a2", "b2"]
+    assert scheduler.in_flight == scheduler.queued == 0
+
+
+def test_session_busy_and_scheduler_full():
+    async def run():
+        scheduler = FairScheduler(max_in_flight=1, max_queued=1)
+        release = asyncio.Event()
+        order = []
+        running = scheduler.submit("a", recording_job(order, "a0", release))
+        with pytest.raises(SessionBusy):
+            scheduler.submit("a", recording_job(order, "a1"))
+        queued = scheduler.submit("b", recording_job(order, "b0"))
+        with pytest.raises(SchedulerFull) as refused:
+            scheduler.submit("c", recording_job(order, "c0"))
+        assert not isinstance(refused.value, SessionBusy)
+        release.set()
+        assert await asyncio.gather(running, queued) == ["a0", "b0"]
+        # Room again once the queue drained
+        assert await scheduler.submit("a", recording_job(order, "a1")) == "a1"
+        return order
+
+    assert asyncio.run(run()) == ["a0", "b0", "a1"]
+
+
+def test_cancel_while_queued():
+    async def run():
+        scheduler = FairScheduler(max_in_flight=1, max_per_session=2)
+        release = asyncio.Event()
+        order = []
+        running = scheduler.submit("a", recording_job(order, "a0", release))
+        dropped = scheduler.submit("b", recording_job(order, "b0"))
+        kept = scheduler.submit("b", recording_job(order, "b1"))
+        dropped.cancel()
+        release.set()
+        await asyncio.gather(running, kept)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    assert order == ["a0", "b1"]
+    assert scheduler.in_flight == scheduler.queued == 0
+
+
+def test_cancel_while_running():
+    async def run():
+        scheduler = FairScheduler(max_in_flight=1)
+        order = []
+        running = scheduler.submit("a", recording_job(order, "a0", asyncio.Event()))
+        queued = scheduler.submit("b", recording_job(order, "b0"))
+        await asyncio.sleep(0)
+        running.cancel()
+        return await queued, order
+
+    assert asyncio.run(run()) == ("b0", ["a0", "b0"])
+
+
+async def request(port, method, path, body=None):
+    """Send one request to the game server. Returns (status, final event or JSON body, session id)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        headers[name.strip().lower()] = value.strip()
+    result, session_id = None, None
+    if headers.get("content-type") == "text/event-stream":
+        async for event, data in read_events(reader):
+            if event == "session":
+                session_id = data["session_id"]
+            else:
+                result = (event, data)
+    else:
+        result = json.loads(await reader.readexactly(int(headers["content-length"])))
+    writer.close()
+    return status, result, session_id
+
+
+def serve(test, **settings):
+    """Run test(server, port) against a game server generating with a slow StubBackend."""
+    async def run():
+        server = GameServer("stub", port=0, backend=StubBackend(reply_tokens=8, token_delay=0.02), **settings)
+        _, port = await server.start()
+        try:
+            return await test(server, port)
+        finally:
+            await server.stop()
+    return asyncio.run(run())
+
+
+def test_turn_while_busy_is_refused():
+    async def test(server, port):
+        _, _, session_id = await request(port, "POST", "/sessions", {})
+        path = f"/sessions/{session_id}/turns"
+        first = asyncio.ensure_future(request(port, "POST", path, {"input": "I open the door"}))
+        while not server.scheduler.in_flight:
+            await asyncio.sleep(0.005)
+        second = await request(port, "POST", path, {"input": "I run"})
+        return (await first)[:2], second
+
+    first, second = serve(test)
+    assert first[0] == 200 and first[1][0] == "done"
+    assert second[0] == 409
+
+
+def test_refused_creates_leave_no_session():
+    async def test(server, port):
+        results = await asyncio.gather(*(request(port, "POST", "/sessions", {}) for _ in range(4)))
+        return sorted(status for status, _, _ in results), dict(server.sessions)
+
+    statuses, sessions = serve(test, max_queued=1)
+    # One opening runs, one waits, the others are turned away
+    assert statuses == [200, 200, 429, 429]
+    assert len(sessions) == 2
+
+
+@pytest.mark.parametrize("deadline", ["soon", 0, -1, True, [1]])
+def test_bad_deadline_is_refused(deadline):
+    async def test(server, port):
+        created = await request(port, "POST", "/sessions", {"deadline": deadline})
+        return created[0], len(server.sessions)
+
+    assert serve(test) == (400, 0)
@@ -0,0 +1,192 @@
+import os
+import pytest
+from python.main.GameFolder.AIAdventureGame import AIAdventureGame
+from python.main.GameFolder.journal import MAGIC, RECORD_HEADER, TurnJournal
+from python.main.GenerationBackends.stub_backend import StubBackend
+
+
+def write_records(path, count):
+    """Append count turn records; returns the offset after each one."""
+    with TurnJournal(path) as journal:
+        return [journal.append({"type": "turn", "user": f"action {i}", "assistant": f"reply {i}"})
+                for i in range(count)]
+
+
+def test_records_round_trip(tmp_path):
+    path = str(tmp_path / "session.journal")
+    ends = write_records(path, 5)
+    with TurnJournal(path) as journal:
+        assert journal.end == ends[-1] == os.path.getsize(path)
+        assert [end for end, _ in journal.records()] == ends
+        assert [record["user"] for _, record in journal.records()] == [f"action {i}" for i in range(5)]
+        # Reading from a record boundary skips everything before it
+        assert [record["user"] for _, record in journal.records(ends[2])] == ["action 3", "action 4"]
+
+
+def test_torn_record_is_truncated_on_reopen(tmp_path):
+    path = str(tmp_path / "session.journal")
+    ends = write_records(path, 5)
+    # Cut the last record at every point: inside its header and inside its payload
+    for cut in range(ends[3] + 1, ends[4]):
+        with open(path, "r+b") as f:
+            f.truncate(cut)
+        with TurnJournal(path) as journal:
+            assert journal.end == ends[3], cut
+            assert os.path.getsize(path) == ends[3]
+            assert [record["user"] for _, record in journal.records()] == [f"action {i}" for i in range(4)]
+            journal.append({"type": "turn", "user": "action 4", "assistant": "reply 4"})
+            assert journal.end == ends[4]
+
+
+def test_corrupt_record_is_truncated_on_reopen(tmp_path):
+    path = str(tmp_path / "session.journal")
+    ends = write_records(path, 3)
+    with open(path, "r+b") as f:
+        f.seek(ends[1] + RECORD_HEADER.size)  # First payload byte of the last record
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    with TurnJournal(path) as journal:
+        assert journal.end == ends[1]
+        assert len(list(journal.records())) == 2
+
+
+def test_new_and_foreign_files(tmp_path):
+    path = str(tmp_path / "new" / "session.journal")
+    with TurnJournal(path) as journal:
+        assert journal.end == len(MAGIC)
+        assert list(journal.records()) == []
+    other = tmp_path / "notes.txt"
+    other.write_bytes(b"not a journal")
+    with pytest.raises(ValueError):
+        TurnJournal(str(other))
+
+
+def test_snapshot_offset(tmp_path):
+    path = str(tmp_path / "session.journal")
+    with TurnJournal(path) as journal:
+        journal.append({"type": "turn", "user": "a", "assistant": "b"})
+        journal.save_snapshot({"summary": "s"})
+        after_snapshot = journal.end
+        journal.append({"type": "turn", "user": "c", "assistant": "d"})
+        end = journal.end
+    with TurnJournal(path) as journal:
+        snapshot = journal.load_snapshot()
+        assert snapshot == {"summary": "s", "offset": after_snapshot}
+        assert journal.end == end
+        assert [record["user"] for _, record in journal.records(snapshot["offset"])] == ["c"]
+
+
+def test_snapshot_past_the_end_is_ignored(tmp_path):
+    # The journal lost records the snapshot already covered (e.g. restored from an older copy)
+    path = str(tmp_path / "session.journal")
+    ends = write_records(path, 4)
+    with TurnJournal(path) as journal:
+        journal.save_snapshot({"summary": "s"})
+    with open(path, "r+b") as f:
+        f.truncate(ends[1])
+    with TurnJournal(path) as journal:
+        assert journal.end == ends[1]
+        assert len(list(journal.records())) == 2
+        assert journal.load_snapshot() is None
+    assert not os.path.exists(path + ".snapshot")
+
+
+def test_reset(tmp_path):
+    path = str(tmp_path / "session.journal")
+    write_records(path, 3)
+    with TurnJournal(path) as journal:
+        journal.save_snapshot({})
+        journal.reset()
+        assert journal.end == len(MAGIC)
+        assert journal.load_snapshot() is None
+        assert list(journal.records()) == []
+
+
+def new_game():
+    return AIAdventureGame("stub", stream=False, backend=StubBackend(reply_tokens=8))
+
+
+def play(path, turns, snapshot_after=None):
+    """Play turns on a new game saved to path, snapshotting after snapshot_after turns. Returns the game."""
+    game = new_game()
+    game.journal = TurnJournal(path)
+    game.prepare_game()
+    for i in range(turns):
+        game._generate_response(f"action {i}")
+        if i + 1 == snapshot_after:
+            game.save_snapshot()
+    game.journal.close()
+    return game
+
+
+def test_resume_reuses_context_at_snapshot(tmp_path):
+    path = str(tmp_path / "session.journal")
+    played = play(path, 3, snapshot_after=3)
+    game = new_game()
+    with TurnJournal(path) as journal:
+        last_reply = game.resume(journal)
+    assert last_reply == played.conversation_history[-1]["content"]
+    assert played.context
+    assert game.context == played.context
+    assert game.conversation_history == played.conversation_history
+    assert game._turns_since_snapshot == 0
+
+
+def test_resume_rebuilds_after_later_turns(tmp_path):
+    path = str(tmp_path / "session.journal")
+    played = play(path, 5, snapshot_after=2)
+    game = new_game()
+    with TurnJournal(path) as journal:
+        last_reply = game.resume(journal)
+    assert last_reply == played.conversation_history[-1]["content"]
+    # The saved tokens only cover the first two turns
+    assert game.context is None
+    assert game.conversation_history == played.conversation_history
+    assert [message["content"] for message in game.context_window.turns[-2:]] == \
+        [message["content"] for message in played.conversation_history[-2:]]
+    assert game._turns_since_snapshot == 3
+
+
+def test_resume_without_snapshot_replays_the_journal(tmp_path):
+    path = str(tmp_path / "session.journal")
+    played = play(path, 3)
+    game = new_game()
+    with TurnJournal(path) as journal:
+        assert journal.load_snapshot() is None
+        game.resume(journal)
+    assert game.context is None
+    assert game.conversation_history == played.conversation_history
+
+
+def test_resume_empty_journal(tmp_path):
+    game = new_game()
+    with TurnJournal(str(tmp_path / "session.journal")) as journal:
+        assert game.resume(journal) is None
+    assert game.journal is None
+
+
+def test_resume_ignores_snapshot_past_the_end(tmp_path):
+    path = str(tmp_path / "session.journal")
+    played = play(path, 4, snapshot_after=4)
+    with TurnJournal(path) as journal:
+        ends = [end for end, _ in journal.records()]  # The start record, then one per turn
+    with open(path, "r+b") as f:
+        f.truncate(ends[2])  # Keep the first two turns only
+    game = new_game()
+    game.resume(TurnJournal(path))
+    assert game.context is None
+    assert game.conversation_history == played.conversation_history[:5]
+    for i in range(2, 5):
+        game._generate_response(f"action {i}")
+    game.journal.close()
+
+    # Nothing played after the resume is lost when the journal is opened again
+    with TurnJournal(path) as journal:
+        turns = [record["user"] for _, record in journal.records() if record["type"] == "turn"]
+    assert turns == [f"action {i}" for i in range(5)]
+    resumed = new_game()
+    with TurnJournal(path) as journal:
+        resumed.resume(journal)
+    assert [message["content"] for message in resumed.conversation_history[1::2]] == \
+        [f"action {i}" for i in range(5)]
@@ -0,0 +1,84 @@
+import json
+import numpy as np
+import pytest
+from python.main.GameFolder.memory import TurnMemory
+
+DIM = 4
+
+
+def vector(i):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i % DIM] = 1.0
+    v[(i + 1) % DIM] = i  # Distinct per passage
+    return v / np.linalg.norm(v)
+
+
+@pytest.fixture
+def memory():
+    memory = TurnMemory(client=None, initial_capacity=2)
+    yield memory
+    memory.close()
+
+
+def add(memory, *numbers):
+    for i in numbers:
+        memory.append(vector(i), f"p{i}")
+
+
+def assert_aligned(memory, numbers):
+    assert memory.passages == [f"p{i}" for i in numbers]
+    for row, i in enumerate(numbers):
+        np.testing.assert_array_equal(memory.vectors[row], vector(i))
+
+
+def test_save_and_load(tmp_path, memory):
+    path = str(tmp_path / "session.memory")
+    add(memory, 0, 1, 2)
+    memory.save(path)
+    add(memory, 3)
+    memory.save(path)
+    loaded = TurnMemory(client=None)
+    assert loaded.load(path)
+    assert_aligned(loaded, [0, 1, 2, 3])
+    loaded.close()
+
+
+def test_load_nothing_saved(tmp_path, memory):
+    assert not memory.load(str(tmp_path / "missing.memory"))
+
+
+def crash_after_vectors(path, i):
+    """A crash between the two appends of save(): the row is written, its passage is not."""
+    with open(path, "ab") as f:
+        f.write(vector(i).tobytes())
+
+
+def crash_after_passages(path, i):
+    """The passages file got the line, the vectors file did not."""
+    with open(path + ".jsonl", "ab") as f:
+        f.write((json.dumps(f"p{i}") + "\n").encode())
+
+
+def crash_mid_line(path, i):
+    with open(path + ".jsonl", "ab") as f:
+        f.write(json.dumps(f"p{i}").encode()[:2])
+
+
+@pytest.mark.parametrize("crash", [crash_after_vectors, crash_after_passages, crash_mid_line])
+def test_saves_after_a_crash_stay_aligned(tmp_path, memory, crash):
+    path = str(tmp_path / "session.memory")
+    add(memory, 0, 1)
+    memory.save(path)
+    crash(path, 2)
+
+    resumed = TurnMemory(client=None)
+    assert resumed.load(path)
+    assert_aligned(resumed, [0, 1])
+    add(resumed, 3, 4)
+    resumed.save(path)
+    resumed.close()
+
+    reloaded = TurnMemory(client=None)
+    assert reloaded.load(path)
+    assert_aligned(reloaded, [0, 1, 3, 4])
+    reloaded.close()
@@ -0,0 +1,70 @@
+import json
+from python.main.utils.ndjson import NDJSONParser, iter_ndjson
+
+RECORDS = [
+    {"model": "llama3.2:latest", "response": "The ", "done": False},
+    {"model": "llama3.2:latest", "response": "dragon’s lair — ", "done": False},
+    {"model": "llama3.2:latest", "response": "燃える城 🐉", "done": False},
+    {"model": "llama3.2:latest", "response": "", "done": True, "context": [1, 2, 3], "eval_count": 3},
+]
+STREAM = b"".join(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n" for record in RECORDS)
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_every_chunk_size():
+    # Size 1 up to the whole stream: every record boundary and every byte of
+    # a multibyte character falls on a chunk edge for some size
+    for size in range(1, len(STREAM) + 1):
+        assert list(iter_ndjson(chunked(STREAM, size))) == RECORDS, size
+
+
+def test_split_inside_multibyte_character():
+    character = "🐉".encode("utf-8")
+    start = STREAM.index(character)
+    for offset in range(1, len(character)):
+        parser = NDJSONParser()
+        records = parser.feed(STREAM[:start + offset])
+        records += parser.feed(STREAM[start + offset:])
+        assert records == RECORDS
+        assert parser.close() == []
+
+
+def test_records_returned_once_complete():
+    parser = NDJSONParser()
+    first = json.dumps(RECORDS[0]).encode()
+    assert parser.feed(first[:-1]) == []
+    assert parser.feed(first[-1:]) == []
+    assert parser.feed(b"\n") == [RECORDS[0]]
+
+
+def test_several_records_in_one_chunk():
+    assert NDJSONParser().feed(STREAM) == RECORDS
+
+
+def test_blank_lines_and_crlf_are_skipped():
+    data = b"\n" + json.dumps(RECORDS[0]).encode() + b"\r\n\r\n" + json.dumps(RECORDS[3]).encode() + b"\n\n"
+    assert list(iter_ndjson(chunked(data, 3))) == [RECORDS[0], RECORDS[3]]
+
+
+def test_str_chunks():
+    assert list(iter_ndjson(chunked(STREAM.decode("utf-8"), 5))) == RECORDS
+
+
+def test_trailing_record_without_newline():
+    data = STREAM.rstrip(b"\n")
+    for size in (1, 7, len(data)):
+        parser = NDJSONParser()
+        records = [record for chunk in chunked(data, size) for record in parser.feed(chunk)]
+        assert records == RECORDS[:-1]
+        assert parser.close() == [RECORDS[-1]]
+        assert parser.close() == []
+
+
+def test_close_without_trailing_data():
+    parser = NDJSONParser()
+    parser.feed(STREAM)
+    assert parser.close() == []
+    assert NDJSONParser().close() == []